@@ -14,7 +14,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Try to import our modules with fallbacks
 try:
     from config import settings
-    from redis_client import redis_store
+    from redis_client import get_redis_store
     from embedding_service import embedding_service
     from document_processor import document_processor
     from chat_service import chat_service
@@ -145,7 +145,7 @@ async def health_check():
     try:
         if CONFIG_AVAILABLE:
             # Try to ping Redis
-            redis_healthy = redis_store.redis_client.ping() if redis_store else False
+            redis_healthy = get_redis_store().redis_client.ping()
             return HealthResponse(
                 status="healthy" if redis_healthy else "degraded",
                 message="All systems operational" if redis_healthy else "Redis connection issues"
@@ -203,7 +203,7 @@ async def upload_document(file: UploadFile = File(...)):
             
             # Store in Redis
             for chunk, embedding in zip(chunks, embeddings):
-                redis_store.store_chunk(chunk, embedding)
+                get_redis_store().store_chunk(chunk, embedding)
             
             return {
                 "message": f"Successfully processed {file.filename} with {len(chunks)} chunks",
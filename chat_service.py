@@ -1,8 +1,9 @@
+import asyncio
 import openai
 from typing import List, Dict, Any, Optional
 import logging
 from config import settings
-from redis_client import redis_store
+from redis_client import SearchHit, get_redis_store
 from embedding_service import embedding_service
 
 logger = logging.getLogger(__name__)
@@ -36,11 +37,11 @@ Each piece of context will include:
         query: str, 
         top_k: int = None, 
         use_hybrid_search: bool = True
-    ) -> List[Dict[str, Any]]:
+    ) -> List[SearchHit]:
         """Retrieve relevant context for a query."""
         try:
-            # Generate query embedding
-            query_embedding = embedding_service.get_query_embedding(query)
+            # Generate query embedding, reusing it for repeat queries
+            query_embedding = get_redis_store().cached_embedding(query, embedding_service.get_query_embedding)
             
             # Use configured top_k or default
             if top_k is None:
@@ -48,14 +49,14 @@ Each piece of context will include:
             
             # Retrieve context using hybrid search
             if use_hybrid_search:
-                context_chunks = redis_store.hybrid_search(
+                context_chunks = get_redis_store().hybrid_search(
                     query_embedding=query_embedding,
                     text_query=query,
                     top_k=top_k
                 )
             else:
                 # Pure vector search
-                context_chunks = redis_store.vector_search(
+                context_chunks = get_redis_store().vector_search(
                     query_embedding=query_embedding,
                     top_k=top_k
                 )
@@ -67,7 +68,42 @@ Each piece of context will include:
             logger.error(f"Error retrieving context: {str(e)}")
             return []
     
-    def format_context(self, context_chunks: List[Dict[str, Any]]) -> str:
+    async def retrieve_context_async(
+        self, 
+        query: str, 
+        top_k: int = None, 
+        use_hybrid_search: bool = True
+    ) -> List[SearchHit]:
+        """Retrieve relevant context for a query without blocking the event loop."""
+        try:
+            # Cache lookup and OpenAI call are blocking; keep them off the event loop
+            query_embedding = await asyncio.to_thread(
+                get_redis_store().cached_embedding, query, embedding_service.get_query_embedding
+            )
+            
+            if top_k is None:
+                top_k = settings.top_k_results
+            
+            if use_hybrid_search:
+                context_chunks = await get_redis_store().hybrid_search_async(
+                    query_embedding=query_embedding,
+                    text_query=query,
+                    top_k=top_k
+                )
+            else:
+                context_chunks = await get_redis_store().vector_search_async(
+                    query_embedding=query_embedding,
+                    top_k=top_k
+                )
+            
+            logger.info(f"Retrieved {len(context_chunks)} context chunks for query")
+            return context_chunks
+            
+        except Exception as e:
+            logger.error(f"Error retrieving context: {str(e)}")
+            return []
+    
+    def format_context(self, context_chunks: List[SearchHit]) -> str:
         """Format context chunks for the LLM prompt."""
         if not context_chunks:
             return "No relevant context found."
@@ -75,11 +111,11 @@ Each piece of context will include:
         formatted_context = []
         
         for i, chunk in enumerate(context_chunks, 1):
-            source = chunk.get('filename', 'Unknown')
-            doc_id = chunk.get('doc_id', 'unknown')
-            chunk_id = chunk.get('chunk_id', 'unknown')
-            text = chunk.get('text', '')
-            source_url = chunk.get('source_url', '')
+            source = chunk.filename
+            doc_id = chunk.doc_id
+            chunk_id = chunk.chunk_id
+            text = chunk.text
+            source_url = chunk.source_url
             
             context_entry = f"""
 Document {i}:
@@ -95,7 +131,7 @@ Content: {text}
     def generate_response(
         self, 
         query: str, 
-        context_chunks: List[Dict[str, Any]]
+        context_chunks: List[SearchHit]
     ) -> Dict[str, Any]:
         """Generate a response using OpenAI Chat API."""
         try:
@@ -129,12 +165,12 @@ Please provide a comprehensive answer based on the context provided above. Inclu
             sources = []
             for chunk in context_chunks:
                 source_info = {
-                    "doc_id": chunk.get('doc_id'),
-                    "chunk_id": chunk.get('chunk_id'),
-                    "filename": chunk.get('filename'),
-                    "source_url": chunk.get('source_url', ''),
-                    "relevance_score": chunk.get('score', chunk.get('combined_score', 0)),
-                    "text_snippet": chunk.get('text', '')[:200] + "..." if len(chunk.get('text', '')) > 200 else chunk.get('text', '')
+                    "doc_id": chunk.doc_id,
+                    "chunk_id": chunk.chunk_id,
+                    "filename": chunk.filename,
+                    "source_url": chunk.source_url,
+                    "relevance_score": chunk.score if chunk.score is not None else (chunk.combined_score or 0),
+                    "text_snippet": chunk.text[:200] + "..." if len(chunk.text) > 200 else chunk.text
                 }
                 sources.append(source_info)
             
@@ -191,6 +227,22 @@ Please provide a comprehensive answer based on the context provided above. Inclu
                 "error": str(e)
             }
     
+    async def chat_async(
+        self, 
+        query: str, 
+        top_k: int = None, 
+        use_hybrid_search: bool = True
+    ) -> Dict[str, Any]:
+        """Async chat workflow for the API: retrieval on redis.asyncio, generation in a worker thread."""
+        context_chunks = await self.retrieve_context_async(
+            query=query, 
+            top_k=top_k, 
+            use_hybrid_search=use_hybrid_search
+        )
+        
+        # generate_response handles its own errors
+        return await asyncio.to_thread(self.generate_response, query, context_chunks)
+    
     def get_chat_history_summary(self, messages: List[Dict[str, str]]) -> str:
         """Generate a summary of chat history for context."""
         try:
@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field, model_validator
 
@@ -11,6 +11,11 @@ class Settings(BaseSettings):
     redis_port: int = 6379
     redis_password: Optional[str] = None
     redis_db: int = 0
+    redis_max_connections: int = 64  # Shared connection pool size
+    redis_pool_timeout: float = 20.0  # Seconds to wait for a free pooled connection
+    redis_socket_timeout: Optional[float] = 10.0
+    redis_health_check_interval: int = 30
+    redis_use_resp3: bool = False  # RESP3 on the binary (vector search / write) client; needs Redis 6+
     
     # Embedding Configuration
     embedding_provider: str = "openai"  # "openai" or "local"
@@ -18,6 +23,20 @@ class Settings(BaseSettings):
     embedding_model: str = "text-embedding-ada-002"  # For OpenAI
     local_embedding_model: str = "all-MiniLM-L6-v2"  # Lightweight local model
     chat_model: str = "gpt-3.5-turbo"
+    # Element type of vectors in the RediSearch index; changing it requires
+    # dropping and re-creating the index
+    vector_dtype: Literal["float32", "float16", "int8"] = "float32"
+    # HNSW graph parameters; M and EF_CONSTRUCTION only apply when the index is created
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 200
+    hnsw_ef_runtime: int = 64  # Default per-query candidate list size
+    embedding_cache_ttl: int = 86400  # Seconds a cached query embedding is kept
+    # Deferred indexing: queue new chunks in a stream (searched by brute force)
+    # and write them to the HNSW index in background batches
+    deferred_indexing: bool = False
+    pending_chunks_batch: int = 128
+    pending_chunks_poll_interval: float = 1.0  # Seconds between drains when the queue is empty
+    pending_chunks_scan_limit: int = 5000  # Most queued chunks a search scans
     
     # Google Drive API Configuration
     google_client_id: Optional[str] = None
@@ -39,6 +58,9 @@ class Settings(BaseSettings):
     
     # Webhook Configuration
     webhook_secret: Optional[str] = None
+    webhook_dedup_ttl: int = 7200  # Seconds a processed notification is remembered
+    webhook_max_concurrent: int = 8  # Documents processed at once from Drive notifications
+    webhook_coalesce_window: float = 5.0  # Quiet seconds before a burst of notifications is processed
     
     @model_validator(mode='after')
     def validate_openai_key(self):
@@ -14,7 +14,7 @@ from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 from document_processor import document_processor
-from redis_client import redis_store
+from redis_client import get_redis_store
 
 logger = logging.getLogger(__name__)
 
@@ -226,7 +226,7 @@ class FileMonitorService:
             
             # Store in Redis
             mapping_key = f"file_mapping:{doc_id}"
-            redis_store.redis_client.hset(mapping_key, mapping=metadata)
+            get_redis_store().redis_client.hset(mapping_key, mapping=metadata)
             
             logger.info(f"Stored file metadata: {file_path} -> {doc_id}")
             
@@ -236,14 +236,12 @@ class FileMonitorService:
     async def _remove_document_chunks(self, doc_id: str):
         """Remove all chunks for a document"""
         try:
-            chunks = redis_store.get_document_chunks(doc_id)
-            for chunk in chunks:
-                redis_store.delete_chunk(chunk['chunk_id'])
+            chunks_removed = get_redis_store().delete_document_chunks(doc_id)
             
             # Remove document metadata
-            redis_store.delete_document(doc_id)
+            get_redis_store().delete_document(doc_id)
             
-            logger.info(f"Removed {len(chunks)} chunks for document {doc_id}")
+            logger.info(f"Removed {chunks_removed} chunks for document {doc_id}")
             
         except Exception as e:
             logger.error(f"Error removing document chunks: {str(e)}")
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import io
 import json
@@ -8,6 +9,8 @@ from google_auth_oauthlib.flow import Flow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.http import MediaIoBaseDownload
+import google_auth_httplib2
+import httplib2
 import requests
 import logging
 from config import settings
@@ -117,6 +120,15 @@ class GoogleDriveService:
         """Check if we have valid credentials."""
         return self.service is not None and self.credentials is not None
     
+    def new_http(self) -> google_auth_httplib2.AuthorizedHttp:
+        """Authorized HTTP transport for requests made off the main thread.
+        
+        httplib2 connections aren't thread-safe, so a call run in a worker
+        thread passes its own transport to ``execute(http=...)`` instead of
+        sharing the one built into ``self.service``.
+        """
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+    
     def extract_file_id_from_url(self, url: str) -> Optional[str]:
         """Extract Google Drive file ID from URL."""
         try:
@@ -146,8 +158,17 @@ class GoogleDriveService:
             logger.error(f"Error extracting file ID from URL {url}: {str(e)}")
             return None
     
-    def get_file_metadata(self, file_id: str) -> Optional[Dict[str, Any]]:
-        """Get metadata for a Google Drive file."""
+    def get_file_metadata(
+        self,
+        file_id: str,
+        http: Optional[httplib2.Http] = None,
+        raise_errors: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Get metadata for a Google Drive file.
+        
+        Pass ``http`` (see new_http) when calling from a worker thread. Errors
+        are logged and None returned, unless ``raise_errors`` is set.
+        """
         try:
             if not self.is_authenticated():
                 logger.error("Not authenticated with Google Drive")
@@ -157,18 +178,27 @@ class GoogleDriveService:
             file_metadata = self.service.files().get(
                 fileId=file_id,
                 fields='id,name,mimeType,modifiedTime,size,webViewLink,parents'
-            ).execute()
+            ).execute(http=http)
             
             logger.info(f"Retrieved metadata for file: {file_metadata.get('name')}")
             return file_metadata
             
         except Exception as e:
             logger.error(f"Error getting file metadata for {file_id}: {str(e)}")
+            if raise_errors:
+                raise
             return None
     
     async def get_file_info(self, file_id: str) -> Optional[Dict[str, Any]]:
-        """Async wrapper for get_file_metadata (for webhook service compatibility)."""
-        return self.get_file_metadata(file_id)
+        """Async wrapper for get_file_metadata; the request runs in a worker thread.
+        
+        Drive errors (HttpError, network errors) are raised so callers can
+        tell transient failures from permanent ones.
+        """
+        if not self.is_authenticated():
+            logger.error("Not authenticated with Google Drive")
+            return None
+        return await asyncio.to_thread(self.get_file_metadata, file_id, self.new_http(), True)
     
     def list_folders(self) -> List[Dict[str, Any]]:
         """List all folders in Google Drive."""
@@ -196,8 +226,17 @@ class GoogleDriveService:
             logger.error(f"Error listing folders: {str(e)}")
             return []
     
-    def watch_folder_changes(self, folder_id: str, webhook_url: str, webhook_secret: Optional[str] = None) -> Dict[str, Any]:
-        """Set up webhook to watch for changes in a specific folder."""
+    def watch_folder_changes(
+        self,
+        folder_id: str,
+        webhook_url: str,
+        webhook_secret: Optional[str] = None,
+        http: Optional[httplib2.Http] = None
+    ) -> Dict[str, Any]:
+        """Set up webhook to watch for changes in a specific folder.
+        
+        Pass ``http`` (see new_http) when calling from a worker thread.
+        """
         try:
             if not self.is_authenticated():
                 raise Exception("Not authenticated with Google Drive")
@@ -220,7 +259,7 @@ class GoogleDriveService:
             result = self.service.changes().watch(
                 body=watch_request,
                 supportsAllDrives=True
-            ).execute()
+            ).execute(http=http)
             
             logger.info(f"Successfully set up webhook for folder {folder_id}")
             return {
@@ -235,14 +274,22 @@ class GoogleDriveService:
             logger.error(f"Error setting up folder webhook: {str(e)}")
             return {"status": "error", "message": str(e)}
     
-    def watch_all_changes(self, webhook_url: str, webhook_secret: Optional[str] = None) -> Dict[str, Any]:
-        """Set up webhook to watch for all Google Drive changes."""
+    def watch_all_changes(
+        self,
+        webhook_url: str,
+        webhook_secret: Optional[str] = None,
+        http: Optional[httplib2.Http] = None
+    ) -> Dict[str, Any]:
+        """Set up webhook to watch for all Google Drive changes.
+        
+        Pass ``http`` (see new_http) when calling from a worker thread.
+        """
         try:
             if not self.is_authenticated():
                 raise Exception("Not authenticated with Google Drive")
             
             # Get current start page token
-            start_page_token = self.service.changes().getStartPageToken().execute()
+            start_page_token = self.service.changes().getStartPageToken().execute(http=http)
             
             # Create watch request
             watch_request = {
@@ -261,7 +308,7 @@ class GoogleDriveService:
                 body=watch_request,
                 pageToken=start_page_token.get('startPageToken'),
                 supportsAllDrives=True
-            ).execute()
+            ).execute(http=http)
             
             logger.info("Successfully set up webhook for all Drive changes")
             return {
@@ -277,18 +324,34 @@ class GoogleDriveService:
             return {"status": "error", "message": str(e)}
     
     async def download_file(self, file_id: str) -> Optional[str]:
-        """Async wrapper for download_file_content (for webhook service compatibility)."""
-        return self.download_file_content(file_id)
+        """Async wrapper for download_file_content; the download runs in a worker thread.
+        
+        Drive errors (HttpError, network errors) are raised so callers can
+        tell transient failures from permanent ones.
+        """
+        if not self.is_authenticated():
+            logger.error("Not authenticated with Google Drive")
+            return None
+        return await asyncio.to_thread(self.download_file_content, file_id, self.new_http(), True)
     
-    def download_file_content(self, file_id: str) -> Optional[str]:
-        """Download file content from Google Drive."""
+    def download_file_content(
+        self,
+        file_id: str,
+        http: Optional[httplib2.Http] = None,
+        raise_errors: bool = False
+    ) -> Optional[str]:
+        """Download file content from Google Drive.
+        
+        Pass ``http`` (see new_http) when calling from a worker thread. Errors
+        are logged and None returned, unless ``raise_errors`` is set.
+        """
         try:
             if not self.is_authenticated():
                 logger.error("Not authenticated with Google Drive")
                 return None
             
             # Get file metadata first
-            metadata = self.get_file_metadata(file_id)
+            metadata = self.get_file_metadata(file_id, http, raise_errors)
             if not metadata:
                 return None
             
@@ -321,6 +384,9 @@ class GoogleDriveService:
             else:
                 # Regular files
                 request = self.service.files().get_media(fileId=file_id)
+            if http is not None:
+                # MediaIoBaseDownload sends every chunk over request.http
+                request.http = http
             
             # Download content
             file_io = io.BytesIO()
@@ -354,6 +420,8 @@ class GoogleDriveService:
             
         except Exception as e:
             logger.error(f"Error downloading file {file_id}: {str(e)}")
+            if raise_errors:
+                raise
             return None
     
     def _get_file_extension(self, mime_type: str) -> str:
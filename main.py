@@ -1,3 +1,4 @@
+import asyncio
 import os
 import time
 import logging
@@ -11,7 +12,7 @@ import uvicorn
 
 # Import our modules
 from config import settings
-from redis_client import redis_store
+from redis_client import get_redis_store
 from embedding_service import embedding_service
 from document_processor import document_processor
 from google_drive_service import google_drive_service
@@ -72,6 +73,33 @@ class HealthResponse(BaseModel):
     services: Dict[str, str]
 
 
+# Background tasks started with the app; referenced so they aren't garbage collected
+background_workers = set()
+
+
+async def drain_pending_chunks_worker():
+    """Move chunks queued for deferred indexing into the search index."""
+    while True:
+        try:
+            drained = await asyncio.to_thread(get_redis_store().drain_pending_chunks)
+        except Exception as e:
+            logger.error(f"Error draining pending chunks: {str(e)}")
+            drained = 0
+        
+        # Keep draining while there is a backlog, otherwise poll
+        if not drained:
+            await asyncio.sleep(settings.pending_chunks_poll_interval)
+
+
+@app.on_event("startup")
+async def start_background_workers():
+    """Start background workers for the enabled features."""
+    if settings.deferred_indexing:
+        task = asyncio.create_task(drain_pending_chunks_worker())
+        background_workers.add(task)
+        task.add_done_callback(background_workers.discard)
+
+
 # API Endpoints
 
 @app.get("/", response_class=HTMLResponse)
@@ -318,7 +346,7 @@ async def root():
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
-    redis_healthy = redis_store.health_check()
+    redis_healthy = get_redis_store().health_check()
     
     services = {
         "redis": "healthy" if redis_healthy else "unhealthy",
@@ -389,16 +417,10 @@ async def process_document_task(file_path: str, source_url: str):
         embeddings = embedding_service.generate_embeddings_batch(texts)
         
         # Store chunks in Redis
-        for chunk, embedding in zip(chunks, embeddings):
-            redis_store.store_chunk(
-                doc_id=chunk["doc_id"],
-                chunk_id=chunk["chunk_id"],
-                text=chunk["text"],
-                embedding=embedding,
-                source_url=chunk["source_url"],
-                filename=chunk["filename"],
-                last_modified=chunk["last_modified"]
-            )
+        get_redis_store().enqueue_chunks([
+            {**chunk, "embedding": embedding}
+            for chunk, embedding in zip(chunks, embeddings)
+        ])
         
         logger.info(f"Successfully processed and stored document {doc_id}")
         
@@ -497,16 +519,10 @@ async def process_single_drive_file(file_id: str, url: str):
         texts = [chunk["text"] for chunk in chunks]
         embeddings = embedding_service.generate_embeddings_batch(texts)
         
-        for chunk, embedding in zip(chunks, embeddings):
-            redis_store.store_chunk(
-                doc_id=chunk["doc_id"],
-                chunk_id=chunk["chunk_id"],
-                text=chunk["text"],
-                embedding=embedding,
-                source_url=chunk["source_url"],
-                filename=chunk["filename"],
-                last_modified=chunk["last_modified"]
-            )
+        get_redis_store().enqueue_chunks([
+            {**chunk, "embedding": embedding}
+            for chunk, embedding in zip(chunks, embeddings)
+        ])
         
         logger.info(f"Successfully processed Google Drive file: {file_id}")
         
@@ -520,13 +536,14 @@ async def chat_endpoint(request: ChatRequest):
     try:
         # Use contextual chat if history provided
         if request.chat_history:
-            response = chat_service.contextual_chat(
+            response = await asyncio.to_thread(
+                chat_service.contextual_chat,
                 query=request.query,
                 chat_history=request.chat_history,
                 top_k=request.top_k
             )
         else:
-            response = chat_service.chat(
+            response = await chat_service.chat_async(
                 query=request.query,
                 top_k=request.top_k,
                 use_hybrid_search=request.use_hybrid_search
@@ -577,7 +594,7 @@ async def google_auth_callback(code: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/webhooks/drive")
+@app.post("/webhooks/drive", status_code=202)
 async def drive_webhook(request: Request):
     """Handle Google Drive webhook notifications"""
     try:
@@ -585,7 +602,10 @@ async def drive_webhook(request: Request):
         body = await request.body()
         
         # Get signature from headers
-        signature = request.headers.get('X-Goog-Channel-Token', '')
+        signature = (
+            request.headers.get('X-Signature-BLAKE2B')
+            or request.headers.get('X-Goog-Channel-Token', '')
+        )
         
         # Verify webhook signature
         if not webhook_service.verify_webhook_signature(body, signature):
@@ -595,7 +615,7 @@ async def drive_webhook(request: Request):
         notification_data = await request.json()
         
         # Process the notification
-        result = await webhook_service.handle_drive_notification(notification_data)
+        result = await webhook_service.handle_drive_notification(notification_data, request.headers)
         
         return result
         
@@ -608,7 +628,7 @@ async def drive_webhook(request: Request):
 async def setup_webhook(folder_id: Optional[str] = None):
     """Setup Google Drive webhook for automatic change detection"""
     try:
-        result = webhook_service.setup_drive_webhook(folder_id)
+        result = await webhook_service.setup_drive_webhook(folder_id)
         return result
         
     except Exception as e:
@@ -616,6 +636,17 @@ async def setup_webhook(folder_id: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/webhooks/stats")
+async def webhook_stats():
+    """Webhook delivery counters"""
+    try:
+        return {"duplicate_notifications": get_redis_store().get_webhook_duplicate_count()}
+        
+    except Exception as e:
+        logger.error(f"Error getting webhook stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/google-drive/folders")
 async def list_google_drive_folders():
     """List Google Drive folders to help find folder IDs"""
@@ -648,12 +679,11 @@ async def list_documents():
         documents = []
         
         # Scan for all drive mappings
-        for key in redis_store.redis_client.scan_iter(match="drive_mapping:*"):
-            doc_data = redis_store.redis_client.hgetall(key)
+        for key in get_redis_store().redis_client.scan_iter(match="drive_mapping:*"):
+            doc_data = get_redis_store().redis_client.hgetall(key)
             if doc_data:
                 # Get chunk count
-                chunks = redis_store.get_document_chunks(doc_data.get('doc_id', ''))
-                doc_data['chunk_count'] = len(chunks)
+                doc_data['chunk_count'] = get_redis_store().count_document_chunks(doc_data.get('doc_id', ''))
                 documents.append(doc_data)
         
         return {
@@ -670,22 +700,18 @@ async def list_documents():
 async def delete_document(doc_id: str):
     """Delete a document and all its chunks"""
     try:
-        # Get document chunks
-        chunks = redis_store.get_document_chunks(doc_id)
+        # Remove all chunks in one round-trip
+        chunks_removed = get_redis_store().delete_document_chunks(doc_id)
         
-        if not chunks:
+        if not chunks_removed:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Remove all chunks
-        for chunk in chunks:
-            redis_store.delete_chunk(chunk['chunk_id'])
-        
         # Remove document metadata
-        redis_store.delete_document(doc_id)
+        get_redis_store().delete_document(doc_id)
         
         return {
             "message": f"Successfully deleted document {doc_id}",
-            "chunks_removed": len(chunks)
+            "chunks_removed": chunks_removed
         }
         
     except HTTPException:
@@ -1,13 +1,28 @@
+import asyncio
+import functools
+import hashlib
 import json
-import numpy as np
-from typing import List, Dict, Any, Optional
+import os
+import re
+import socket
+import time
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Callable, Iterator, List, Dict, Any, Optional, Tuple, Union
 import redis
+import redis.asyncio as aioredis
+from redis.utils import HIREDIS_AVAILABLE
 from config import settings
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+if TYPE_CHECKING:
+    import numpy
+
+# Embeddings may be plain lists (OpenAI client) or NumPy arrays
+Embedding = Union[List[float], "numpy.ndarray"]
+
 # Try to import RediSearch components, but handle gracefully if not available
 try:
     from redis.commands.search.field import VectorField, TextField, NumericField
@@ -19,24 +34,306 @@ except ImportError:
     REDIS_SEARCH_AVAILABLE = False
     logger.warning("RediSearch not available, using fallback storage")
 
+# NumPy is only needed on the vector paths; imported on first use
+_np = None
+
+
+def _numpy():
+    """Return the numpy module, importing it on first call."""
+    global _np
+    if _np is None:
+        import numpy
+        _np = numpy
+    return _np
+
+# settings.vector_dtype -> RediSearch VectorField TYPE
+INDEX_VECTOR_TYPES = {"float32": "FLOAT32", "float16": "FLOAT16", "int8": "INT8"}
+
+# Chunk hash fields returned to callers (everything except the embedding).
+# Metadata and embedding share one hash so KNN filters can use metadata
+# fields; reads always name their fields (HMGET, RETURN) so the embedding
+# only crosses the wire when a caller asks for it.
+CHUNK_FIELDS = ("doc_id", "chunk_id", "text", "source_url", "filename", "last_modified")
+
+# Chunk hash field names as written, pre-encoded once for the binary write path
+_CHUNK_HASH_FIELDS = tuple(field.encode() for field in (*CHUNK_FIELDS, "embedding"))
+
+# Splits user text on RediSearch's default tokenizer separators, so each
+# term matches the way the indexed text was tokenized.
+_FT_TERM = re.compile(r"[^\s,.<>{}\[\]\"':;!@#$%^&*()\-+=~|/\\?`]+")
+
+# Probe idle pooled connections so NAT/load-balancer timeouts surface as a
+# dead socket within ~2.5 minutes instead of a stall on the next command.
+# Linux names; platforms lacking one of them just skip that option.
+TCP_KEEPALIVE_OPTIONS = {
+    getattr(socket, name): value
+    for name, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 30), ("TCP_KEEPCNT", 3))
+    if hasattr(socket, name)
+}
+
+# Reciprocal Rank Fusion constant used by hybrid search
+RRF_K = 60
+
+# Incremented on every chunk write so cached views of the corpus can be invalidated
+CHUNKS_VERSION_KEY = "chunks:version"
+
+# Stream of chunks waiting to be written into the HNSW index (deferred indexing).
+# Each document's queued entries are tracked in a pending_chunks:{doc_id} hash
+# (stream entry id -> chunk id) so deletes can purge them from the stream.
+PENDING_CHUNKS_STREAM = "pending_chunks"
+
+# Drain workers read the stream through one consumer group so each entry goes
+# to a single worker; an entry a worker took but never acknowledged is
+# reclaimed once it has been idle this long
+PENDING_CHUNKS_GROUP = "indexers"
+PENDING_CLAIM_IDLE_MS = 60000
+
+# KEYS: chunk hash, doc_chunks set, all_chunks set, version counter
+# ARGV: flattened field/value pairs for the chunk hash
+STORE_CHUNK_LUA = """
+redis.call('HSET', KEYS[1], unpack(ARGV))
+redis.call('SADD', KEYS[2], KEYS[1])
+redis.call('SADD', KEYS[3], KEYS[1])
+redis.call('INCR', KEYS[4])
+return 1
+"""
+
+# KEYS: doc_chunks set, all_chunks set, version counter
+# Unlinks every chunk of the document and its bookkeeping atomically, so a
+# chunk stored mid-delete can't be left orphaned. Returns the chunk count.
+# The chunk hashes it unlinks are read from the set rather than declared in
+# KEYS, so this only works on a single (non-cluster) Redis.
+DELETE_DOCUMENT_CHUNKS_LUA = """
+local keys = redis.call('SMEMBERS', KEYS[1])
+for i = 1, #keys, 1000 do
+    local batch = {unpack(keys, i, math.min(i + 999, #keys))}
+    redis.call('UNLINK', unpack(batch))
+    redis.call('SREM', KEYS[2], unpack(batch))
+end
+redis.call('UNLINK', KEYS[1])
+redis.call('INCR', KEYS[3])
+return #keys
+"""
+
+# KEYS: pending stream, document's pending-entry hash
+# ARGV: chunk id, then flattened field/value pairs for the entry
+ENQUEUE_CHUNK_LUA = """
+local id = redis.call('XADD', KEYS[1], '*', unpack(ARGV, 2))
+redis.call('HSET', KEYS[2], id, ARGV[1])
+return id
+"""
+
+# KEYS: chunk hash, doc_chunks set, all_chunks set, version counter,
+#       pending stream, document's pending-entry hash
+# ARGV: stream entry id, consumer group, then flattened field/value pairs
+# Stores a drained chunk only if its entry is still tracked (the document
+# wasn't deleted since it was queued), then acknowledges and removes the
+# entry, all atomically. Returns 1 if the chunk was stored.
+DRAIN_CHUNK_LUA = """
+local stored = 0
+if redis.call('HDEL', KEYS[6], ARGV[1]) == 1 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+    redis.call('SADD', KEYS[2], KEYS[1])
+    redis.call('SADD', KEYS[3], KEYS[1])
+    redis.call('INCR', KEYS[4])
+    stored = 1
+end
+redis.call('XACK', KEYS[5], ARGV[2], ARGV[1])
+redis.call('XDEL', KEYS[5], ARGV[1])
+return stored
+"""
+
+# KEYS: pending stream, document's pending-entry hash
+# ARGV: optional chunk id; without it every queued entry of the document goes.
+# Returns the number of entries removed from the stream.
+PURGE_PENDING_CHUNKS_LUA = """
+local entries = redis.call('HGETALL', KEYS[2])
+local ids = {}
+for i = 1, #entries, 2 do
+    if not ARGV[1] or entries[i + 1] == ARGV[1] then
+        ids[#ids + 1] = entries[i]
+    end
+end
+for i = 1, #ids, 1000 do
+    local batch = {unpack(ids, i, math.min(i + 999, #ids))}
+    redis.call('XDEL', KEYS[1], unpack(batch))
+    redis.call('HDEL', KEYS[2], unpack(batch))
+end
+return #ids
+"""
+
+# Total duplicate webhook deliveries seen, for telemetry
+WEBHOOK_DUPLICATES_KEY = "webhook:duplicate_count"
+
+# KEYS: dedup marker, duplicate counter; ARGV: marker TTL in seconds
+# Returns 0 the first time a notification is seen, otherwise the updated
+# duplicate count
+MARK_NOTIFICATION_LUA = """
+if redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+return redis.call('INCR', KEYS[2])
+"""
+
+
+def _quantize_int8(matrix):
+    """Quantize each row of a float32 matrix to INT8 with a per-row scale.
+
+    The scale is not stored: cosine similarity is invariant to it, so the
+    fallback search can score the quantized vectors directly.
+    """
+    np = _numpy()
+    max_abs = np.abs(matrix).max(axis=1, keepdims=True)
+    scale = np.divide(127.0, max_abs, out=np.zeros_like(max_abs), where=max_abs > 0)
+    return np.round(matrix * scale).astype(np.int8)
+
+
+def _parse_timestamp(value: Optional[str]) -> int:
+    """Parse a stored last_modified value as integer epoch seconds."""
+    if not value:
+        return 0
+    try:
+        return int(value)
+    except ValueError:
+        # Chunks written before timestamps were stored as integers
+        return int(float(value))
+
+
+@dataclass(slots=True)
+class SearchHit:
+    """A chunk returned by vector or hybrid search."""
+    doc_id: str
+    chunk_id: str
+    text: str
+    source_url: str
+    filename: str
+    last_modified: int
+    score: Optional[float] = None  # Vector score, when the chunk came from the KNN side
+    combined_score: Optional[float] = None  # RRF score, set by hybrid search
+    text_match: bool = False
+    
+    def asdict(self) -> Dict[str, Any]:
+        """Return the hit as a plain dict, for callers that need one."""
+        return asdict(self)
+
+
+class _FallbackCorpus:
+    """In-process snapshot of the fallback chunk store.
+
+    Embeddings are stacked into one L2-normalized float32 matrix so a query is
+    a single matrix-vector product, and lower-cased chunk texts are packed into
+    one NUL-separated bytes buffer so a text query is a handful of C-level
+    ``bytes.find`` calls. Tagged with ``chunks:version`` so callers can tell
+    when it is stale.
+    """
+
+    def __init__(
+        self,
+        version: Optional[str],
+        keys: List[str],
+        rows: List[Dict[str, Any]],
+        embeddings: List[Optional[bytes]],
+        vector_dim: int
+    ):
+        np = _numpy()
+        self.version = version
+        self.keys = keys
+        self.rows = rows
+        
+        encoded = [row["text"].lower().encode() for row in rows]
+        self.text_blob = b"\0".join(encoded)
+        # offsets[i] is where chunk i starts; offsets[i + 1] is where the next one starts
+        lengths = np.fromiter((len(t) + 1 for t in encoded), dtype=np.int64, count=len(encoded))
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)))
+        
+        # INT8 vectors -> one pre-normalized matrix; unusable rows stay zero
+        vectors = np.zeros((len(keys), vector_dim), dtype=np.float32)
+        for i, raw in enumerate(embeddings):
+            if not raw:
+                continue
+            if len(raw) == vector_dim:
+                vectors[i] = np.frombuffer(raw, dtype=np.int8)
+                continue
+            # Chunks written before embeddings were stored as raw bytes
+            try:
+                values = json.loads(raw)
+            except ValueError:
+                logger.warning(f"Error processing chunk {keys[i]}: invalid embedding")
+                continue
+            if len(values) == vector_dim:
+                vectors[i] = values
+        norms = np.linalg.norm(vectors, axis=1)
+        self.valid = norms > 0
+        vectors[self.valid] /= norms[self.valid, None]
+        self.vectors = vectors
+
+    def cosine_scores(self, query_embedding: Embedding):
+        """Cosine similarity of every chunk to the query, -inf for unusable chunks.
+
+        Returns None if the query cannot be scored against this corpus.
+        """
+        np = _numpy()
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if query.shape != (self.vectors.shape[1],) or norm == 0.0:
+            return None
+        
+        # Rows are unit length, so normalizing the query leaves a plain dot product
+        scores = np.einsum("ij,j->i", self.vectors, query / norm, optimize=True)
+        scores[~self.valid] = -np.inf
+        return scores
+
+    def filter_mask(self, filter_dict: Dict[str, str]):
+        """Boolean mask of chunks whose fields equal every filter value."""
+        np = _numpy()
+        return np.fromiter(
+            (
+                all(str(row.get(field, "")) == value for field, value in filter_dict.items())
+                for row in self.rows
+            ),
+            dtype=bool,
+            count=len(self.rows)
+        )
+
+    def match_text(self, text_query: str) -> List[int]:
+        """Return indexes of chunks whose text contains the query (case-insensitive)."""
+        np = _numpy()
+        needle = text_query.lower().encode()
+        if not needle:
+            return list(range(len(self.keys)))
+        if b"\0" in needle:
+            return []
+        
+        matches = []
+        pos = self.text_blob.find(needle)
+        while pos != -1:
+            index = int(np.searchsorted(self.offsets, pos, side="right")) - 1
+            matches.append(index)
+            # Skip the rest of this chunk; one hit per chunk is enough
+            pos = self.text_blob.find(needle, int(self.offsets[index + 1]))
+        return matches
+
 
 class RedisVectorStore:
     def __init__(self):
         """Initialize Redis connection and vector search index."""
-        # Use Redis URL if provided, otherwise use individual settings
-        if settings.redis_url:
-            self.redis_client = redis.from_url(
-                settings.redis_url,
-                decode_responses=True
-            )
-        else:
-            self.redis_client = redis.Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                password=settings.redis_password,
-                db=settings.redis_db,
-                decode_responses=True
-            )
+        # Text client for metadata and a binary client for raw embedding bytes.
+        # Reply decoding is a property of the pool's connections, so each
+        # client gets its own explicitly sized pool.
+        self.redis_client = redis.Redis(connection_pool=self._create_pool(decode_responses=True))
+        use_resp3 = settings.redis_use_resp3 and self._server_supports_resp3()
+        self.redis_binary = redis.Redis(
+            connection_pool=self._create_pool(decode_responses=False, protocol=3 if use_resp3 else 2)
+        )
+        
+        if not HIREDIS_AVAILABLE:
+            logger.warning("hiredis not installed; Redis replies are parsed in pure Python")
+        
+        # asyncio client for the query path so concurrent requests don't hold
+        # a worker thread per round-trip; connects lazily on first await
+        self.async_client = aioredis.Redis(
+            connection_pool=self._create_pool(aioredis.BlockingConnectionPool, decode_responses=True)
+        )
         
         # Index name for document chunks
         self.index_name = "doc_chunks_idx"
@@ -45,6 +342,23 @@ class RedisVectorStore:
         # Vector dimensions (OpenAI text-embedding-ada-002 = 1536)
         self.vector_dim = 1536
         
+        # Cached snapshot of the fallback store, see _get_fallback_corpus
+        self._fallback_corpus: Optional[_FallbackCorpus] = None
+        
+        # Server-side scripts (loaded lazily via EVALSHA on first call)
+        self._store_chunk_script = self.redis_client.register_script(STORE_CHUNK_LUA)
+        self._delete_document_chunks_script = self.redis_client.register_script(
+            DELETE_DOCUMENT_CHUNKS_LUA
+        )
+        self._mark_notification_script = self.redis_client.register_script(MARK_NOTIFICATION_LUA)
+        self._enqueue_chunk_script = self.redis_client.register_script(ENQUEUE_CHUNK_LUA)
+        self._purge_pending_chunks_script = self.redis_client.register_script(PURGE_PENDING_CHUNKS_LUA)
+        self._drain_chunk_script = self.redis_client.register_script(DRAIN_CHUNK_LUA)
+        
+        # This process's name in the pending_chunks consumer group
+        self._drain_consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._drain_group_ready = False
+        
         # Check if RediSearch is available
         self.search_available = self._check_redis_search()
         
@@ -54,6 +368,45 @@ class RedisVectorStore:
         else:
             logger.info("Using fallback storage without vector search")
     
+    @staticmethod
+    def _create_pool(pool_class=redis.BlockingConnectionPool, **extra_kwargs):
+        """Create a blocking connection pool from the configured Redis settings.
+
+        Callers block for a free connection instead of failing when the pool
+        is exhausted. ``pool_class`` selects the sync or asyncio pool.
+        """
+        pool_kwargs = {
+            "max_connections": settings.redis_max_connections,
+            "timeout": settings.redis_pool_timeout,
+            "health_check_interval": settings.redis_health_check_interval,
+            "socket_keepalive": True,
+            "socket_keepalive_options": TCP_KEEPALIVE_OPTIONS,
+            "socket_timeout": settings.redis_socket_timeout,
+            **extra_kwargs
+        }
+        
+        # Use Redis URL if provided, otherwise use individual settings
+        if settings.redis_url:
+            return pool_class.from_url(settings.redis_url, **pool_kwargs)
+        return pool_class(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            password=settings.redis_password,
+            db=settings.redis_db,
+            **pool_kwargs
+        )
+    
+    def _server_supports_resp3(self) -> bool:
+        """Check the server is Redis 6+, which RESP3 (HELLO 3) requires."""
+        try:
+            version = self.redis_client.info("server")["redis_version"]
+            if int(version.split(".")[0]) >= 6:
+                return True
+            logger.warning(f"Redis {version} does not support RESP3; using RESP2")
+        except Exception as e:
+            logger.warning(f"Could not check Redis version, using RESP2: {str(e)}")
+        return False
+    
     def _check_redis_search(self) -> bool:
         """Check if RediSearch is available on the Redis instance."""
         if not REDIS_SEARCH_AVAILABLE:
@@ -79,9 +432,25 @@ class RedisVectorStore:
             
         try:
             # Check if index already exists
-            self.redis_client.ft(self.index_name).info()
+            info = self.redis_client.ft(self.index_name).info()
             logger.info(f"Index {self.index_name} already exists")
         except redis.ResponseError:
+            info = None
+        
+        if info is not None:
+            # Vectors of another element type would be silently left out of
+            # the index and fail every KNN query, so refuse to run against it
+            indexed_type = self._indexed_vector_type(info)
+            expected_type = INDEX_VECTOR_TYPES[settings.vector_dtype]
+            if indexed_type is None:
+                logger.warning(f"Could not read the vector type of index {self.index_name}")
+            elif indexed_type != expected_type:
+                raise RuntimeError(
+                    f"Index {self.index_name} stores {indexed_type} vectors but VECTOR_DTYPE "
+                    f"is {settings.vector_dtype}; set VECTOR_DTYPE to match or drop and "
+                    f"re-create the index"
+                )
+        else:
             # Create new index
             logger.info(f"Creating new index: {self.index_name}")
             
@@ -96,9 +465,12 @@ class RedisVectorStore:
                     "embedding",
                     "HNSW",
                     {
-                        "TYPE": "FLOAT32",
+                        "TYPE": INDEX_VECTOR_TYPES[settings.vector_dtype],
                         "DIM": self.vector_dim,
-                        "DISTANCE_METRIC": "COSINE"
+                        "DISTANCE_METRIC": "COSINE",
+                        "M": settings.hnsw_m,
+                        "EF_CONSTRUCTION": settings.hnsw_ef_construction,
+                        "EF_RUNTIME": settings.hnsw_ef_runtime
                     }
                 )
             ]
@@ -113,170 +485,505 @@ class RedisVectorStore:
             )
             logger.info(f"Successfully created index: {self.index_name}")
     
+    @staticmethod
+    def _indexed_vector_type(info: Dict[str, Any]) -> Optional[str]:
+        """Element type (e.g. FLOAT32) of the embedding field in FT.INFO output"""
+        for attribute in info.get("attributes", []):
+            fields = dict(zip(attribute[::2], attribute[1::2]))
+            if fields.get("identifier") == "embedding":
+                data_type = fields.get("data_type")
+                return str(data_type).upper() if data_type else None
+        return None
+    
+    def _serialize_embeddings(self, embeddings) -> List[bytes]:
+        """Serialize a batch of embeddings for storage.
+
+        The batch is converted to one C-contiguous float32 matrix (zero-copy
+        when it already is one) and encoded with a single ``tobytes`` call:
+        ``settings.vector_dtype`` for the HNSW index, INT8 for the fallback scan.
+        """
+        np = _numpy()
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != self.vector_dim:
+            raise ValueError(
+                f"Expected embeddings of dimension {self.vector_dim}, got shape {matrix.shape}"
+            )
+        
+        if self.search_available:
+            encoded = self._encode_index_vectors(matrix)
+        else:
+            encoded = _quantize_int8(matrix)
+        
+        buffer = encoded.tobytes()
+        stride = encoded.shape[1] * encoded.itemsize
+        return [buffer[i * stride:(i + 1) * stride] for i in range(len(encoded))]
+    
+    def _encode_index_vectors(self, matrix):
+        """Encode float32 rows in the index's element type (settings.vector_dtype)."""
+        np = _numpy()
+        if settings.vector_dtype == "int8":
+            # COSINE distance ignores the per-vector scale, so it is not stored
+            return _quantize_int8(matrix)
+        return matrix.astype(np.float16 if settings.vector_dtype == "float16" else np.float32)
+    
+    def _encode_query_vector(self, query_embedding: Embedding) -> bytes:
+        """Serialize a query embedding to match the index's vector type."""
+        np = _numpy()
+        matrix = np.ascontiguousarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        return self._encode_index_vectors(matrix).tobytes()
+    
+    def _store_chunk_payload(
+        self,
+        doc_id: str,
+        chunk_id: str,
+        text: str,
+        embedding_value: bytes,
+        source_url: str = "",
+        filename: str = "",
+        last_modified: float = 0
+    ) -> Tuple[List[str], List[bytes]]:
+        """Build the script keys and args that store one serialized chunk.
+
+        Args are bytes in ``_CHUNK_HASH_FIELDS`` order so the binary client
+        sends them as-is; each string is encoded exactly once here.
+        """
+        key = f"{self.chunk_prefix}{doc_id}:{chunk_id}"
+        
+        values = (
+            doc_id.encode(),
+            chunk_id.encode(),
+            text.encode(),
+            source_url.encode(),
+            filename.encode(),
+            b"%d" % int(last_modified),
+            embedding_value
+        )
+        
+        keys = [key, f"doc_chunks:{doc_id}", "all_chunks", CHUNKS_VERSION_KEY]
+        flat_fields = [item for pair in zip(_CHUNK_HASH_FIELDS, values) for item in pair]
+        return keys, flat_fields
+    
     def store_chunk(
         self,
         doc_id: str,
         chunk_id: str,
         text: str,
-        embedding: List[float],
+        embedding: Embedding,
         source_url: str = "",
         filename: str = "",
         last_modified: float = 0
     ) -> bool:
         """Store a document chunk with its embedding in Redis."""
         try:
-            key = f"{self.chunk_prefix}{doc_id}:{chunk_id}"
-            
-            chunk_data = {
-                "doc_id": doc_id,
-                "chunk_id": chunk_id,
-                "text": text,
-                "source_url": source_url,
-                "filename": filename,
-                "last_modified": str(last_modified),
-                "embedding": json.dumps(embedding)  # Store as JSON string for fallback
-            }
-            
-            # Store in Redis
-            self.redis_client.hset(key, mapping=chunk_data)
-            
-            # Also store in a document list for fallback searches
-            doc_chunks_key = f"doc_chunks:{doc_id}"
-            self.redis_client.sadd(doc_chunks_key, key)
+            embedding_value = self._serialize_embeddings([embedding])[0]
+            keys, args = self._store_chunk_payload(
+                doc_id, chunk_id, text, embedding_value, source_url, filename, last_modified
+            )
             
-            # Store in global chunks list for fallback
-            self.redis_client.sadd("all_chunks", key)
+            # Store the hash, the per-document and global chunk sets and bump
+            # the corpus version atomically in one round-trip
+            self._store_chunk_script(keys=keys, args=args, client=self.redis_binary)
             
-            logger.info(f"Stored chunk: {key}")
+            logger.info(f"Stored chunk: {keys[0]}")
             return True
             
         except Exception as e:
             logger.error(f"Error storing chunk {doc_id}:{chunk_id}: {str(e)}")
             return False
     
+    def store_chunks_bulk(self, items: List[Dict[str, Any]]) -> List[bool]:
+        """Store many chunks in a single pipelined round-trip.
+
+        Each item carries the ``store_chunk`` arguments (``doc_id``, ``chunk_id``,
+        ``text``, ``embedding`` and optionally ``source_url``, ``filename`` and
+        ``last_modified``); other keys are ignored. Returns one success flag
+        per item.
+        """
+        stored = [False] * len(items)
+        queued = []
+        if not items:
+            return stored
+        
+        # Serialize the whole batch at once; fall back to per-item so one
+        # malformed embedding only fails its own chunk
+        try:
+            embedding_values = self._serialize_embeddings([item["embedding"] for item in items])
+        except Exception:
+            embedding_values = []
+            for item in items:
+                try:
+                    embedding_values.append(self._serialize_embeddings([item["embedding"]])[0])
+                except Exception:
+                    embedding_values.append(None)
+        
+        # Binary client: the pre-encoded args and embedding bytes go out untouched
+        pipe = self.redis_binary.pipeline(transaction=False)
+        for i, item in enumerate(items):
+            try:
+                if embedding_values[i] is None:
+                    raise ValueError("invalid embedding")
+                keys, args = self._store_chunk_payload(
+                    item["doc_id"],
+                    item["chunk_id"],
+                    item["text"],
+                    embedding_values[i],
+                    item.get("source_url", ""),
+                    item.get("filename", ""),
+                    item.get("last_modified", 0)
+                )
+            except Exception as e:
+                logger.error(f"Error storing chunk {item.get('doc_id')}:{item.get('chunk_id')}: {str(e)}")
+                continue
+            self._store_chunk_script(keys=keys, args=args, client=pipe)
+            queued.append(i)
+        
+        if not queued:
+            return stored
+        
+        try:
+            replies = pipe.execute(raise_on_error=False)
+        except Exception as e:
+            logger.error(f"Error storing {len(queued)} chunks: {str(e)}")
+            return stored
+        
+        for i, reply in zip(queued, replies):
+            if isinstance(reply, Exception):
+                logger.error(f"Error storing chunk {items[i]['doc_id']}:{items[i]['chunk_id']}: {str(reply)}")
+            else:
+                stored[i] = True
+        
+        logger.info(f"Stored {sum(stored)}/{len(items)} chunks")
+        return stored
+    
+    def enqueue_chunks(self, items: List[Dict[str, Any]]) -> List[bool]:
+        """Queue chunks for deferred indexing; takes the same items as store_chunks_bulk.
+
+        Chunks are appended to the pending_chunks stream and become searchable
+        right away through a brute-force scan of the stream; the drain worker
+        later writes them to the index in batches. Without deferred indexing
+        (or RediSearch) the chunks are stored directly.
+        """
+        if not settings.deferred_indexing or not self.search_available:
+            return self.store_chunks_bulk(items)
+        
+        np = _numpy()
+        queued = [False] * len(items)
+        pipe = self.redis_binary.pipeline(transaction=False)
+        for i, item in enumerate(items):
+            try:
+                vector = np.ascontiguousarray(item["embedding"], dtype=np.float32)
+                if vector.shape != (self.vector_dim,):
+                    raise ValueError(f"expected {self.vector_dim} dimensions, got {vector.shape}")
+                # Queue unit-length float32 so a pending scan is one dot
+                # product per chunk (cosine ignores scale); the index
+                # encoding is applied when the chunk is drained
+                norm = np.linalg.norm(vector)
+                if norm > 0:
+                    vector = vector / norm
+                _, args = self._store_chunk_payload(
+                    item["doc_id"],
+                    item["chunk_id"],
+                    item["text"],
+                    vector.tobytes(),
+                    item.get("source_url", ""),
+                    item.get("filename", ""),
+                    item.get("last_modified", 0)
+                )
+            except Exception as e:
+                logger.error(f"Error queueing chunk {item.get('doc_id')}:{item.get('chunk_id')}: {str(e)}")
+                continue
+            self._enqueue_chunk_script(
+                keys=[PENDING_CHUNKS_STREAM, f"pending_chunks:{item['doc_id']}"],
+                args=[item["chunk_id"].encode(), *args],
+                client=pipe
+            )
+            queued[i] = True
+        
+        if not any(queued):
+            return queued
+        
+        try:
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error queueing {sum(queued)} chunks: {str(e)}")
+            return [False] * len(items)
+        
+        logger.info(f"Queued {sum(queued)}/{len(items)} chunks for indexing")
+        return queued
+    
+    def drain_pending_chunks(self, count: Optional[int] = None) -> int:
+        """Index up to count queued chunks and drop them from the stream.
+
+        Entries are read through the ``indexers`` consumer group, so
+        concurrent workers never get the same one; entries a worker took but
+        never finished (it died, or the store failed) are reclaimed after
+        PENDING_CLAIM_IDLE_MS. Each entry is checked, stored, acknowledged and
+        removed by one script call, so a document deleted after its chunks
+        were queued is never written back. Returns the number of entries
+        processed.
+        """
+        count = count or settings.pending_chunks_batch
+        if not self._drain_group_ready:
+            try:
+                self.redis_binary.xgroup_create(PENDING_CHUNKS_STREAM, PENDING_CHUNKS_GROUP, id="0", mkstream=True)
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            self._drain_group_ready = True
+        
+        claimed = self.redis_binary.xautoclaim(
+            PENDING_CHUNKS_STREAM, PENDING_CHUNKS_GROUP, self._drain_consumer,
+            PENDING_CLAIM_IDLE_MS, count=count
+        )
+        # Entries deleted while pending come back empty on Redis 6.2
+        entries = [entry for entry in claimed[1] if entry[0] is not None]
+        if len(entries) < count:
+            reply = self.redis_binary.xreadgroup(
+                PENDING_CHUNKS_GROUP, self._drain_consumer,
+                {PENDING_CHUNKS_STREAM: ">"}, count=count - len(entries)
+            )
+            entries += self._stream_entries(reply)
+        if not entries:
+            return 0
+        
+        np = _numpy()
+        rows = [self._decode_pending_entry(fields) for _, fields in entries]
+        embedding_values = self._serialize_embeddings(
+            [np.frombuffer(embedding, dtype=np.float32) for _, embedding in rows]
+        )
+        
+        pipe = self.redis_binary.pipeline(transaction=False)
+        for (entry_id, _), (row, _), embedding_value in zip(entries, rows, embedding_values):
+            keys, args = self._store_chunk_payload(
+                row["doc_id"], row["chunk_id"], row["text"], embedding_value,
+                row["source_url"], row["filename"], row["last_modified"]
+            )
+            self._drain_chunk_script(
+                keys=[*keys, PENDING_CHUNKS_STREAM, f"pending_chunks:{row['doc_id']}"],
+                args=[entry_id, PENDING_CHUNKS_GROUP, *args],
+                client=pipe
+            )
+        replies = pipe.execute(raise_on_error=False)
+        
+        failed = sum(isinstance(reply, Exception) for reply in replies)
+        if failed:
+            logger.error(f"{failed} pending chunks failed to index; will retry")
+        return len(entries) - failed
+    
+    @staticmethod
+    def _stream_entries(reply) -> List[Tuple[bytes, Dict[bytes, bytes]]]:
+        """Flatten an XREADGROUP reply (RESP2 list or RESP3 map) into its entries."""
+        if isinstance(reply, dict):
+            return [entry for streams in reply.values() for entries in streams for entry in entries]
+        return [entry for _, entries in reply or [] for entry in entries]
+    
+    @staticmethod
+    def _decode_pending_entry(fields: Dict[bytes, bytes]) -> Tuple[Dict[str, Any], bytes]:
+        """Split a pending_chunks entry into its decoded chunk row and raw embedding."""
+        row = {field: fields.get(field.encode(), b"").decode() for field in CHUNK_FIELDS}
+        row["last_modified"] = _parse_timestamp(row["last_modified"])
+        return row, fields[b"embedding"]
+    
+    def _pending_hits(
+        self,
+        query_embedding: Embedding,
+        top_k: int,
+        filter_dict: Optional[Dict[str, str]] = None
+    ) -> List[SearchHit]:
+        """Brute-force KNN over chunks still queued for indexing.
+
+        Scores are cosine distances, matching the HNSW KNN scores they are
+        merged with. At most ``pending_chunks_scan_limit`` entries (the oldest)
+        are scanned. Empty unless deferred indexing is enabled.
+        """
+        if not settings.deferred_indexing or top_k <= 0:
+            return []
+        
+        np = _numpy()
+        try:
+            entries = self.redis_binary.xrange(
+                PENDING_CHUNKS_STREAM, count=settings.pending_chunks_scan_limit
+            )
+            if not entries:
+                return []
+            
+            rows, embeddings = zip(*(self._decode_pending_entry(fields) for _, fields in entries))
+            # Queued vectors are unit length and the joined buffer is
+            # C-contiguous, so scoring is a single BLAS matrix-vector product
+            matrix = np.frombuffer(b"".join(embeddings), dtype=np.float32).reshape(-1, self.vector_dim)
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query_norm = np.linalg.norm(query)
+            if query_norm == 0:
+                return []
+            
+            distances = 1.0 - matrix @ (query / query_norm)
+            
+            if filter_dict:
+                for i, row in enumerate(rows):
+                    if any(str(row.get(field, "")) != value for field, value in filter_dict.items()):
+                        distances[i] = np.inf
+            
+            if top_k < len(distances):
+                order = np.argpartition(distances, top_k - 1)[:top_k]
+            else:
+                order = np.arange(len(distances))
+            order = order[np.argsort(distances[order])]
+            return [
+                SearchHit(**rows[i], score=float(distances[i]))
+                for i in order if np.isfinite(distances[i])
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error scanning pending chunks: {str(e)}")
+            return []
+    
+    @staticmethod
+    def _merge_pending(hits: List[SearchHit], pending: List[SearchHit], top_k: int) -> List[SearchHit]:
+        """Merge pending-chunk hits into HNSW hits by cosine distance."""
+        if not pending:
+            return hits
+        
+        # A chunk can briefly be in both while it is being drained
+        seen = {(hit.doc_id, hit.chunk_id) for hit in hits}
+        merged = hits + [hit for hit in pending if (hit.doc_id, hit.chunk_id) not in seen]
+        merged.sort(key=lambda hit: hit.score)
+        return merged[:top_k]
+    
     def vector_search(
         self,
-        query_embedding: List[float],
+        query_embedding: Embedding,
         top_k: int = 5,
-        filter_dict: Optional[Dict[str, str]] = None
-    ) -> List[Dict[str, Any]]:
-        """Perform vector similarity search."""
+        filter_dict: Optional[Dict[str, str]] = None,
+        ef: Optional[int] = None
+    ) -> List[SearchHit]:
+        """Perform vector similarity search.
+
+        ``ef`` overrides the HNSW EF_RUNTIME for this query (RediSearch only).
+        """
         if self.search_available:
-            return self._redis_search_vector_search(query_embedding, top_k, filter_dict)
+            return self._redis_search_vector_search(query_embedding, top_k, filter_dict, ef)
         else:
             return self._fallback_vector_search(query_embedding, top_k, filter_dict)
     
     def _redis_search_vector_search(
         self,
-        query_embedding: List[float],
+        query_embedding: Embedding,
         top_k: int = 5,
-        filter_dict: Optional[Dict[str, str]] = None
-    ) -> List[Dict[str, Any]]:
+        filter_dict: Optional[Dict[str, str]] = None,
+        ef: Optional[int] = None
+    ) -> List[SearchHit]:
         """Perform vector similarity search using RediSearch."""
         try:
-            # Convert query embedding to bytes
-            query_vector = np.array(query_embedding, dtype=np.float32).tobytes()
+            # Convert query embedding to bytes matching the index vector type
+            query_vector = self._encode_query_vector(query_embedding)
             
-            # Build query
-            base_query = f"*=>[KNN {top_k} @embedding $query_vector AS vector_score]"
-            
-            # Add filters if provided
-            if filter_dict:
-                filter_clauses = []
-                for field, value in filter_dict.items():
-                    filter_clauses.append(f"@{field}:{value}")
-                base_query = f"({' '.join(filter_clauses)}) => [KNN {top_k} @embedding $query_vector AS vector_score]"
-            
-            query = Query(base_query).return_fields(
-                "doc_id", "chunk_id", "text", "source_url", "filename", 
-                "last_modified", "vector_score"
-            ).sort_by("vector_score").dialect(2)
-            
-            # Execute search
-            results = self.redis_client.ft(self.index_name).search(
-                query, {"query_vector": query_vector}
+            # Run the KNN on the binary client: ids go straight back into HMGET
+            # and scores parse from bytes, so nothing here needs decoding
+            reply = self.redis_binary.ft(self.index_name).search(
+                self._vector_query(top_k, filter_dict, ef), {"query_vector": query_vector}
             )
             
-            # Format results
-            formatted_results = []
-            for doc in results.docs:
-                result = {
-                    "doc_id": doc.doc_id,
-                    "chunk_id": doc.chunk_id,
-                    "text": doc.text,
-                    "source_url": doc.source_url,
-                    "filename": doc.filename,
-                    "last_modified": float(doc.last_modified),
-                    "score": float(doc.vector_score)
-                }
-                formatted_results.append(result)
-            
-            return formatted_results
+            scores = self._knn_scores(reply)
+            hits = self._scored_hits(scores, self._hydrate_chunks(list(scores)))
+            return self._merge_pending(hits, self._pending_hits(query_embedding, top_k, filter_dict), top_k)
             
         except Exception as e:
             logger.error(f"Error in vector search: {str(e)}")
             return []
     
+    @staticmethod
+    def _knn_scores(reply) -> Dict[bytes, float]:
+        """Map chunk keys to vector scores from an FT.SEARCH reply.
+        
+        Under RESP3 redis-py hands back the raw reply: a map on RediSearch
+        2.8+, the flat ``[total, id, fields, id, fields, ...]`` array before
+        that. Under RESP2 it is a parsed Result.
+        """
+        if isinstance(reply, dict):
+            return {
+                hit[b"id"]: float(hit[b"extra_attributes"][b"vector_score"])
+                for hit in reply[b"results"]
+            }
+        if isinstance(reply, list):
+            scores = {}
+            for key, fields in zip(reply[1::2], reply[2::2]):
+                if not isinstance(fields, dict):
+                    fields = dict(zip(fields[::2], fields[1::2]))
+                scores[key] = float(fields[b"vector_score"])
+            return scores
+        return {doc.id: float(doc.vector_score) for doc in reply.docs}
+    
+    @staticmethod
+    def _knn_clause(top_k: int, ef: Optional[int] = None) -> str:
+        """Build the KNN clause, sizing the HNSW candidate list to at least top_k."""
+        ef_runtime = max(ef or settings.hnsw_ef_runtime, top_k)
+        return f"[KNN {top_k} @embedding $query_vector EF_RUNTIME {ef_runtime} AS vector_score]"
+    
+    def _vector_query(
+        self,
+        top_k: int,
+        filter_dict: Optional[Dict[str, str]] = None,
+        ef: Optional[int] = None
+    ) -> "Query":
+        """Build the KNN query returning only ids and vector scores."""
+        knn_clause = self._knn_clause(top_k, ef)
+        base_query = f"*=>{knn_clause}"
+        
+        # Add filters if provided
+        if filter_dict:
+            filter_clauses = []
+            for field, value in filter_dict.items():
+                filter_clauses.append(f"@{field}:{value}")
+            base_query = f"({' '.join(filter_clauses)}) => {knn_clause}"
+        
+        # KNN already yields nearest-first; paging lifts the default LIMIT 0 10.
+        # Only the score is returned; chunk bodies are fetched for the hits.
+        return Query(base_query).return_fields("vector_score").dialect(2).paging(0, top_k)
+    
+    @staticmethod
+    def _text_query(text_query: str, limit: int) -> Tuple[Optional["Query"], Dict[str, str]]:
+        """Build the full-text query over chunk text, returning ids only.
+        
+        Terms are passed as DIALECT 2 query parameters rather than spliced
+        into the query string, so user text can't break the query syntax.
+        Returns (None, {}) when the text has no searchable terms.
+        """
+        terms = _FT_TERM.findall(text_query)
+        if not terms:
+            return None, {}
+        
+        params = {f"t{i}": term for i, term in enumerate(terms)}
+        query_string = f"@text:({' '.join('$' + name for name in params)})"
+        return Query(query_string).no_content().dialect(2).paging(0, limit), params
+    
     def _fallback_vector_search(
         self,
-        query_embedding: List[float],
+        query_embedding: Embedding,
         top_k: int = 5,
         filter_dict: Optional[Dict[str, str]] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> List[SearchHit]:
         """Fallback vector search using cosine similarity."""
+        np = _numpy()
         try:
-            # Get all chunk keys
-            chunk_keys = self.redis_client.smembers("all_chunks")
-            if not chunk_keys:
+            corpus = self._get_fallback_corpus()
+            scores = corpus.cosine_scores(query_embedding)
+            if scores is None or top_k <= 0:
                 return []
             
-            results = []
-            query_vector = np.array(query_embedding)
-            
-            for key in chunk_keys:
-                chunk_data = self.redis_client.hgetall(key)
-                if not chunk_data:
-                    continue
-                
-                # Apply filters
-                if filter_dict:
-                    skip = False
-                    for field, value in filter_dict.items():
-                        if chunk_data.get(field, "") != value:
-                            skip = True
-                            break
-                    if skip:
-                        continue
-                
-                # Calculate cosine similarity
-                try:
-                    chunk_embedding = np.array(json.loads(chunk_data.get("embedding", "[]")))
-                    if len(chunk_embedding) == len(query_vector):
-                        # Cosine similarity
-                        dot_product = np.dot(query_vector, chunk_embedding)
-                        norm_query = np.linalg.norm(query_vector)
-                        norm_chunk = np.linalg.norm(chunk_embedding)
-                        
-                        if norm_query > 0 and norm_chunk > 0:
-                            similarity = dot_product / (norm_query * norm_chunk)
-                            
-                            result = {
-                                "doc_id": chunk_data.get("doc_id", ""),
-                                "chunk_id": chunk_data.get("chunk_id", ""),
-                                "text": chunk_data.get("text", ""),
-                                "source_url": chunk_data.get("source_url", ""),
-                                "filename": chunk_data.get("filename", ""),
-                                "last_modified": float(chunk_data.get("last_modified", 0)),
-                                "score": float(similarity)
-                            }
-                            results.append(result)
-                except Exception as e:
-                    logger.warning(f"Error processing chunk {key}: {e}")
-                    continue
-            
-            # Sort by similarity score (descending) and return top_k
-            results.sort(key=lambda x: x["score"], reverse=True)
-            return results[:top_k]
+            # Apply filters
+            if filter_dict:
+                scores[~corpus.filter_mask(filter_dict)] = -np.inf
+            
+            # Select the top_k in O(N), then sort only those
+            if top_k < len(scores):
+                order = np.argpartition(scores, -top_k)[-top_k:]
+            else:
+                order = np.arange(len(scores))
+            order = order[np.argsort(-scores[order])]
+            return [
+                SearchHit(**corpus.rows[i], score=float(scores[i]))
+                for i in order if np.isfinite(scores[i])
+            ]
             
         except Exception as e:
             logger.error(f"Error in fallback vector search: {str(e)}")
@@ -284,12 +991,12 @@ class RedisVectorStore:
 
     def hybrid_search(
         self,
-        query_embedding: List[float],
+        query_embedding: Embedding,
         text_query: str,
         top_k: int = 5,
         vector_weight: float = 0.7,
         text_weight: float = 0.3
-    ) -> List[Dict[str, Any]]:
+    ) -> List[SearchHit]:
         """Perform hybrid search combining vector similarity and text search."""
         if self.search_available:
             return self._redis_search_hybrid_search(query_embedding, text_query, top_k, vector_weight, text_weight)
@@ -298,41 +1005,42 @@ class RedisVectorStore:
     
     def _redis_search_hybrid_search(
         self,
-        query_embedding: List[float],
+        query_embedding: Embedding,
         text_query: str,
         top_k: int = 5,
         vector_weight: float = 0.7,
         text_weight: float = 0.3
-    ) -> List[Dict[str, Any]]:
+    ) -> List[SearchHit]:
         """Perform hybrid search using RediSearch."""
         try:
-            # Vector search
-            vector_results = self.vector_search(query_embedding, top_k * 2)
-            
-            # Text search
-            text_query_escaped = text_query.replace("-", "\\-").replace(".", "\\.")
-            text_search_query = Query(f"@text:{text_query_escaped}").return_fields(
-                "doc_id", "chunk_id", "text", "source_url", "filename", "last_modified"
-            ).limit(0, top_k * 2)
-            
-            text_results = self.redis_client.ft(self.index_name).search(text_search_query)
-            
-            # Convert text results to same format
-            text_results_formatted = []
-            for doc in text_results.docs:
-                result = {
-                    "doc_id": doc.doc_id,
-                    "chunk_id": doc.chunk_id,
-                    "text": doc.text,
-                    "source_url": doc.source_url,
-                    "filename": doc.filename,
-                    "last_modified": float(doc.last_modified),
-                    "text_match": True
-                }
-                text_results_formatted.append(result)
+            query_vector = self._encode_query_vector(query_embedding)
+            
+            # Send both searches in one round-trip; pipelined FT.SEARCH replies
+            # come back raw: [total, id, [field, value, ...], ...] or
+            # [total, id, ...] with NOCONTENT
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.ft(self.index_name).search(
+                self._vector_query(top_k * 2), {"query_vector": query_vector}
+            )
+            text_search_query, text_params = self._text_query(text_query, top_k * 2)
+            if text_search_query is not None:
+                pipe.ft(self.index_name).search(text_search_query, text_params)
+            vector_reply, *text_reply = pipe.execute()
+            
+            vector_scores = {
+                key: float(dict(zip(fields[::2], fields[1::2]))["vector_score"])
+                for key, fields in zip(vector_reply[1::2], vector_reply[2::2])
+            }
+            text_keys = list(text_reply[0][1:]) if text_reply else []
+            
+            # Fetch each unique chunk once
+            chunks = self._hydrate_chunks(list(dict.fromkeys([*vector_scores, *text_keys])))
+            pending = self._pending_hits(query_embedding, top_k * 2)
             
             # Combine and score results
-            return self._combine_search_results(vector_results, text_results_formatted, top_k, vector_weight, text_weight)
+            return self._fuse_hybrid_hits(
+                vector_scores, text_keys, chunks, top_k, vector_weight, text_weight, pending
+            )
             
         except Exception as e:
             logger.error(f"Error in hybrid search: {str(e)}")
@@ -341,132 +1049,331 @@ class RedisVectorStore:
     
     def _fallback_hybrid_search(
         self,
-        query_embedding: List[float],
+        query_embedding: Embedding,
         text_query: str,
         top_k: int = 5,
         vector_weight: float = 0.7,
         text_weight: float = 0.3
-    ) -> List[Dict[str, Any]]:
+    ) -> List[SearchHit]:
         """Fallback hybrid search."""
         try:
             # Get vector search results
             vector_results = self._fallback_vector_search(query_embedding, top_k * 2)
             
-            # Simple text matching
-            text_results = []
-            chunk_keys = self.redis_client.smembers("all_chunks")
-            
-            for key in chunk_keys:
-                chunk_data = self.redis_client.hgetall(key)
-                if not chunk_data:
-                    continue
-                
-                text = chunk_data.get("text", "").lower()
-                if text_query.lower() in text:
-                    result = {
-                        "doc_id": chunk_data.get("doc_id", ""),
-                        "chunk_id": chunk_data.get("chunk_id", ""),
-                        "text": chunk_data.get("text", ""),
-                        "source_url": chunk_data.get("source_url", ""),
-                        "filename": chunk_data.get("filename", ""),
-                        "last_modified": float(chunk_data.get("last_modified", 0)),
-                        "text_match": True
-                    }
-                    text_results.append(result)
+            # Simple text matching over the cached corpus snapshot
+            corpus = self._get_fallback_corpus()
+            text_results = [
+                SearchHit(**corpus.rows[i], text_match=True)
+                for i in corpus.match_text(text_query)
+            ]
             
-            # Combine results
-            return self._combine_search_results(vector_results, text_results, top_k, vector_weight, text_weight)
+            # Combine results; substring matches carry no relevance order
+            return self._combine_search_results(
+                vector_results, text_results, top_k, vector_weight, text_weight, text_ranked=False
+            )
             
         except Exception as e:
             logger.error(f"Error in fallback hybrid search: {str(e)}")
             return self._fallback_vector_search(query_embedding, top_k)
 
+    def _get_fallback_corpus(self) -> _FallbackCorpus:
+        """Return the fallback corpus snapshot, rebuilding it if chunks changed."""
+        version = self.redis_client.get(CHUNKS_VERSION_KEY)
+        corpus = self._fallback_corpus
+        if corpus is not None and corpus.version == version:
+            return corpus
+        
+        # Binary client: the embedding bytes are passed straight to NumPy and
+        # only the small metadata fields are decoded
+        chunk_keys = list(self.redis_client.smembers("all_chunks"))
+        pipe = self.redis_binary.pipeline(transaction=False)
+        for key in chunk_keys:
+            pipe.hmget(key, *CHUNK_FIELDS, "embedding")
+        
+        keys, rows, embeddings = [], [], []
+        for key, values in zip(chunk_keys, pipe.execute()):
+            if values[0] is None:
+                continue
+            row = {
+                field: value.decode() if value else ""
+                for field, value in zip(CHUNK_FIELDS, values)
+            }
+            row["last_modified"] = _parse_timestamp(row["last_modified"])
+            keys.append(key)
+            rows.append(row)
+            embeddings.append(values[-1])
+        
+        corpus = _FallbackCorpus(version, keys, rows, embeddings, self.vector_dim)
+        self._fallback_corpus = corpus
+        return corpus
+
+    def _hydrate_chunks(self, keys: List[str]) -> Dict[str, SearchHit]:
+        """Fetch chunk payloads for the given keys with one pipelined HMGET batch."""
+        if not keys:
+            return {}
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(key, *CHUNK_FIELDS)
+        return self._parse_chunk_values(keys, pipe.execute())
+    
+    @staticmethod
+    def _parse_chunk_values(keys: List[str], replies: List[List[Optional[str]]]) -> Dict[str, SearchHit]:
+        """Turn HMGET CHUNK_FIELDS replies into unscored hits keyed by chunk key."""
+        chunks = {}
+        for key, values in zip(keys, replies):
+            if values[0] is None:
+                # Chunk was deleted between the search and the fetch
+                continue
+            doc_id, chunk_id, text, source_url, filename, last_modified = (
+                value or "" for value in values
+            )
+            chunks[key] = SearchHit(
+                doc_id, chunk_id, text, source_url, filename, _parse_timestamp(last_modified)
+            )
+        
+        return chunks
+    
+    @staticmethod
+    def _scored_hits(scores: Dict[str, float], chunks: Dict[str, SearchHit]) -> List[SearchHit]:
+        """Attach vector scores to hydrated hits, keeping the KNN order."""
+        hits = []
+        for key, score in scores.items():
+            hit = chunks.get(key)
+            if hit is not None:
+                hit.score = score
+                hits.append(hit)
+        return hits
+    
+    def _fuse_hybrid_hits(
+        self,
+        vector_scores: Dict[str, float],
+        text_keys: List[str],
+        chunks: Dict[str, SearchHit],
+        top_k: int,
+        vector_weight: float,
+        text_weight: float,
+        pending_hits: List[SearchHit] = ()
+    ) -> List[SearchHit]:
+        """Attach hydrated chunks to RediSearch hybrid hits and fuse the two lists."""
+        vector_results = self._merge_pending(
+            self._scored_hits(vector_scores, chunks), pending_hits, top_k * 2
+        )
+        text_results = [chunks[key] for key in text_keys if key in chunks]
+        return self._combine_search_results(vector_results, text_results, top_k, vector_weight, text_weight)
+
+    # Async query path (redis.asyncio)
+    
+    async def vector_search_async(
+        self,
+        query_embedding: Embedding,
+        top_k: int = 5,
+        filter_dict: Optional[Dict[str, str]] = None,
+        ef: Optional[int] = None
+    ) -> List[SearchHit]:
+        """Async variant of vector_search for use from the event loop."""
+        if not self.search_available:
+            # In-process NumPy scan; keep it off the event loop thread
+            return await asyncio.to_thread(
+                self._fallback_vector_search, query_embedding, top_k, filter_dict
+            )
+        
+        try:
+            query_vector = self._encode_query_vector(query_embedding)
+            results = await self.async_client.ft(self.index_name).search(
+                self._vector_query(top_k, filter_dict, ef), {"query_vector": query_vector}
+            )
+            
+            scores = {doc.id: float(doc.vector_score) for doc in results.docs}
+            hits = self._scored_hits(scores, await self._hydrate_chunks_async(list(scores)))
+            pending = await asyncio.to_thread(self._pending_hits, query_embedding, top_k, filter_dict)
+            return self._merge_pending(hits, pending, top_k)
+            
+        except Exception as e:
+            logger.error(f"Error in async vector search: {str(e)}")
+            return []
+    
+    async def hybrid_search_async(
+        self,
+        query_embedding: Embedding,
+        text_query: str,
+        top_k: int = 5,
+        vector_weight: float = 0.7,
+        text_weight: float = 0.3
+    ) -> List[SearchHit]:
+        """Async variant of hybrid_search for use from the event loop."""
+        if not self.search_available:
+            return await asyncio.to_thread(
+                self._fallback_hybrid_search,
+                query_embedding, text_query, top_k, vector_weight, text_weight
+            )
+        
+        try:
+            query_vector = self._encode_query_vector(query_embedding)
+            search_index = self.async_client.ft(self.index_name)
+            
+            # redis-py's async FT.SEARCH can't be pipelined, so run both
+            # searches concurrently on separate pooled connections instead
+            searches = [
+                search_index.search(self._vector_query(top_k * 2), {"query_vector": query_vector})
+            ]
+            text_search_query, text_params = self._text_query(text_query, top_k * 2)
+            if text_search_query is not None:
+                searches.append(search_index.search(text_search_query, text_params))
+            vector_hits, *text_hits = await asyncio.gather(*searches)
+            
+            vector_scores = {doc.id: float(doc.vector_score) for doc in vector_hits.docs}
+            text_keys = [doc.id for doc in text_hits[0].docs] if text_hits else []
+            
+            chunks = await self._hydrate_chunks_async(list(dict.fromkeys([*vector_scores, *text_keys])))
+            pending = await asyncio.to_thread(self._pending_hits, query_embedding, top_k * 2)
+            return self._fuse_hybrid_hits(
+                vector_scores, text_keys, chunks, top_k, vector_weight, text_weight, pending
+            )
+            
+        except Exception as e:
+            logger.error(f"Error in async hybrid search: {str(e)}")
+            # Fallback to vector search only
+            return await self.vector_search_async(query_embedding, top_k)
+    
+    async def _hydrate_chunks_async(self, keys: List[str]) -> Dict[str, SearchHit]:
+        """Async variant of _hydrate_chunks."""
+        if not keys:
+            return {}
+        
+        async with self.async_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hmget(key, *CHUNK_FIELDS)
+            replies = await pipe.execute()
+        return self._parse_chunk_values(keys, replies)
+
     def _combine_search_results(
         self,
-        vector_results: List[Dict[str, Any]],
-        text_results: List[Dict[str, Any]],
+        vector_results: List[SearchHit],
+        text_results: List[SearchHit],
         top_k: int,
         vector_weight: float,
-        text_weight: float
-    ) -> List[Dict[str, Any]]:
-        """Combine vector and text search results and score them."""
+        text_weight: float,
+        text_ranked: bool = True
+    ) -> List[SearchHit]:
+        """Combine vector and text search results with Reciprocal Rank Fusion.
+
+        Each list contributes ``weight / (RRF_K + rank)`` per result, so the
+        fusion depends only on rank order and not on the scale of cosine
+        distances versus text scores. Unranked text results (``text_ranked``
+        False) all share rank 1.
+        """
+        np = _numpy()
         try:
             # Combine results
             combined_results = {}
             
-            # Add vector results with vector weight
-            for result in vector_results:
-                key = f"{result['doc_id']}:{result['chunk_id']}"
-                combined_results[key] = result.copy()
-                combined_results[key]["combined_score"] = (1 - result["score"]) * vector_weight
+            # Add vector results, ranked nearest-first
+            for rank, result in enumerate(vector_results, 1):
+                result.combined_score = vector_weight / (RRF_K + rank)
+                combined_results[(result.doc_id, result.chunk_id)] = result
             
-            # Add text results with text weight
-            for result in text_results:
-                key = f"{result['doc_id']}:{result['chunk_id']}"
-                if key in combined_results:
+            # Add text results
+            for rank, result in enumerate(text_results, 1):
+                key = (result.doc_id, result.chunk_id)
+                contribution = text_weight / (RRF_K + (rank if text_ranked else 1))
+                existing = combined_results.get(key)
+                if existing is not None:
                     # Boost existing results that match both
-                    combined_results[key]["combined_score"] += text_weight
-                    combined_results[key]["text_match"] = True
+                    existing.combined_score += contribution
+                    existing.text_match = True
                 else:
                     # Add new text-only matches
-                    result["combined_score"] = text_weight
+                    result.combined_score = contribution
+                    result.text_match = True
                     combined_results[key] = result
             
-            # Sort by combined score and return top_k
-            sorted_results = sorted(
-                combined_results.values(),
-                key=lambda x: x["combined_score"],
-                reverse=True
-            )
-            
-            return sorted_results[:top_k]
+            # Return the top_k by combined score: select in O(N), sort only those
+            hits = list(combined_results.values())
+            if top_k <= 0 or not hits:
+                return []
+            scores = np.fromiter((hit.combined_score for hit in hits), dtype=np.float64, count=len(hits))
+            if top_k < len(hits):
+                order = np.argpartition(scores, -top_k)[-top_k:]
+            else:
+                order = np.arange(len(hits))
+            order = order[np.argsort(-scores[order], kind="stable")]
+            return [hits[i] for i in order]
             
         except Exception as e:
             logger.error(f"Error combining search results: {str(e)}")
             return []
     
-    def get_document_chunks(self, doc_id: str) -> List[Dict[str, Any]]:
-        """Get all chunks for a document"""
+    def iter_chunk_ids(self, doc_id: str, batch: int = 512) -> Iterator[List[str]]:
+        """Yield a document's chunk ids in batches, read incrementally with SSCAN."""
+        key_prefix = f"{self.chunk_prefix}{doc_id}:"
+        chunk_ids = []
+        for key in self.redis_client.sscan_iter(f"doc_chunks:{doc_id}", count=batch):
+            chunk_ids.append(key[len(key_prefix):])
+            if len(chunk_ids) >= batch:
+                yield chunk_ids
+                chunk_ids = []
+        if chunk_ids:
+            yield chunk_ids
+    
+    def count_document_chunks(self, doc_id: str) -> int:
+        """Number of stored and queued chunks for a document (no chunk data fetched)"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.scard(f"doc_chunks:{doc_id}")
+        pipe.hlen(f"pending_chunks:{doc_id}")
+        return sum(pipe.execute())
+    
+    def purge_pending_chunks(self, doc_id: str, chunk_id: Optional[str] = None, client=None) -> int:
+        """Drop a document's (or one chunk's) entries from the deferred-indexing queue.
+        
+        Pass a pipeline as ``client`` to queue the purge with other commands.
+        """
+        return self._purge_pending_chunks_script(
+            keys=[PENDING_CHUNKS_STREAM, f"pending_chunks:{doc_id}"],
+            args=[chunk_id] if chunk_id else [],
+            client=client or self.redis_client
+        )
+    
+    def delete_document_chunks(self, doc_id: str) -> int:
+        """Delete all chunks for a specific document; returns how many were removed."""
+        # Collect and unlink the chunks server-side in one round-trip,
+        # dropping any still queued for indexing along with them
+        pipe = self.redis_client.pipeline(transaction=True)
+        self._delete_document_chunks_script(
+            keys=[f"doc_chunks:{doc_id}", "all_chunks", CHUNKS_VERSION_KEY], client=pipe
+        )
+        self.purge_pending_chunks(doc_id, client=pipe)
+        deleted, purged = pipe.execute()
+        
+        logger.info(f"Deleted {deleted} chunks ({purged} queued) for document {doc_id}")
+        return deleted + purged
+    
+    def cached_embedding(self, text: str, compute_fn: Callable[[str], Embedding]) -> Embedding:
+        """Return the embedding for text, computing and caching it on a miss.
+        
+        Embeddings are stored as float32 bytes under a hash of the text, scoped
+        to the embedding model so a model change never serves stale vectors.
+        """
+        np = _numpy()
+        digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+        key = f"emb_cache:{settings.embedding_model}:{digest}"
+        
         try:
-            # Search for chunks belonging to this document
-            query = f"@doc_id:{doc_id}"
-            
-            results = self.redis_client.ft(self.index_name).search(
-                query, 
-                query_params={}
-            )
-            
-            chunks = []
-            for doc in results.docs:
-                chunk_data = {
-                    "chunk_id": doc.id.replace(self.chunk_prefix, ""),
-                    "doc_id": doc.doc_id,
-                    "content": doc.content,
-                    "metadata": json.loads(doc.metadata) if hasattr(doc, 'metadata') else {}
-                }
-                chunks.append(chunk_data)
-            
-            return chunks
-            
+            cached = self.redis_binary.get(key)
+            if cached:
+                return np.frombuffer(cached, dtype=np.float32)
         except Exception as e:
-            logger.error(f"Error retrieving document chunks: {str(e)}")
-            return []
-    
-    def delete_document_chunks(self, doc_id: str) -> bool:
-        """Delete all chunks for a specific document."""
+            logger.warning(f"Error reading embedding cache: {str(e)}")
+        
+        embedding = compute_fn(text)
+        
         try:
-            chunks = self.get_document_chunks(doc_id)
-            
-            for chunk in chunks:
-                key = f"{self.chunk_prefix}{chunk['doc_id']}:{chunk['chunk_id']}"
-                self.redis_client.delete(key)
-            
-            logger.info(f"Deleted {len(chunks)} chunks for document {doc_id}")
-            return True
-            
+            vector = np.asarray(embedding, dtype=np.float32)
+            self.redis_binary.setex(key, settings.embedding_cache_ttl, vector.tobytes())
         except Exception as e:
-            logger.error(f"Error deleting document chunks for {doc_id}: {str(e)}")
-            return False
+            logger.warning(f"Error writing embedding cache: {str(e)}")
+        
+        return embedding
     
     def health_check(self) -> bool:
         """Check if Redis connection is healthy."""
@@ -488,10 +1395,55 @@ class RedisVectorStore:
             "mime_type": metadata.get('mimeType'),
             **metadata
         }
+        # Hash values must be scalars: JSON-encode lists such as ``parents``
+        # and leave out missing fields
+        mapping_data = {
+            field: json.dumps(value) if isinstance(value, (list, dict)) else value
+            for field, value in mapping_data.items() if value is not None
+        }
         
         self.redis_client.hset(mapping_key, mapping=mapping_data)
         logger.info(f"Stored Drive mapping: {drive_id} -> {doc_id}")
     
+    def delete_drive_document_mapping(self, drive_id: str):
+        """Remove the mapping between a Google Drive ID and its document"""
+        self.redis_client.delete(f"drive_mapping:{drive_id}")
+    
+    def store_watch_state_pipeline(self, watch_id: str, state: Dict[str, Any]):
+        """Persist a Drive watch channel's state in one MULTI/EXEC round-trip
+        
+        The hash expires with the channel (``expiration`` is Drive's epoch
+        milliseconds); ``drive:watches`` is a sorted set of the known channel
+        ids scored by that expiration, so ids of expired channels are pruned
+        with ZREMRANGEBYSCORE on every write instead of accumulating.
+        """
+        watch_key = f"drive:watch:{watch_id}"
+        mapping = {field: value for field, value in state.items() if value is not None}
+        expiration = int(state["expiration"]) if state.get("expiration") else None
+        
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset(watch_key, mapping=mapping)
+        if expiration:
+            pipe.pexpireat(watch_key, expiration)
+        pipe.zadd("drive:watches", {watch_id: expiration or float("inf")})
+        pipe.zremrangebyscore("drive:watches", "-inf", f"({int(time.time() * 1000)}")
+        pipe.execute()
+        logger.info(f"Stored Drive watch state: {watch_id}")
+    
+    def mark_notification_seen(self, dedup_key: str, ttl: int) -> int:
+        """Atomically record a webhook notification for duplicate suppression
+        
+        Returns 0 if ``dedup_key`` is new, otherwise the total number of
+        duplicate deliveries seen so far.
+        """
+        return int(self._mark_notification_script(
+            keys=[dedup_key, WEBHOOK_DUPLICATES_KEY], args=[ttl]
+        ))
+    
+    def get_webhook_duplicate_count(self) -> int:
+        """Number of duplicate webhook deliveries suppressed"""
+        return int(self.redis_client.get(WEBHOOK_DUPLICATES_KEY) or 0)
+    
     def get_document_by_drive_id(self, drive_id: str) -> Optional[Dict[str, Any]]:
         """Get document info by Google Drive ID"""
         mapping_key = f"drive_mapping:{drive_id}"
@@ -502,17 +1454,56 @@ class RedisVectorStore:
         return None
     
     def delete_document(self, doc_id: str):
-        """Delete document metadata"""
+        """Delete document metadata and any of its chunks still queued for indexing"""
         doc_key = f"document:{doc_id}"
-        self.redis_client.delete(doc_key)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.delete(doc_key)
+        self.purge_pending_chunks(doc_id, client=pipe)
+        pipe.execute()
         logger.info(f"Deleted document metadata: {doc_id}")
     
-    def delete_chunk(self, chunk_id: str):
+    def delete_chunk(self, doc_id: str, chunk_id: str):
         """Delete a specific chunk"""
-        chunk_key = f"{self.chunk_prefix}{chunk_id}"
-        self.redis_client.delete(chunk_key)
-        logger.info(f"Deleted chunk: {chunk_id}")
+        chunk_key = f"{self.chunk_prefix}{doc_id}:{chunk_id}"
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.unlink(chunk_key)
+        pipe.srem(f"doc_chunks:{doc_id}", chunk_key)
+        pipe.srem("all_chunks", chunk_key)
+        pipe.incr(CHUNKS_VERSION_KEY)
+        self.purge_pending_chunks(doc_id, chunk_id, client=pipe)
+        pipe.execute()
+        logger.info(f"Deleted chunk: {doc_id}:{chunk_id}")
+    
+    def delete_chunks_bulk(self, doc_id: str, chunk_ids: List[str], delete_document: bool = False) -> int:
+        """Delete many chunks of a document in one round-trip.
+        
+        UNLINK frees the hashes off Redis' main thread. With ``delete_document``
+        the document metadata key and any of its chunks still queued for
+        indexing are removed in the same pipeline. Returns the number of chunk
+        keys that existed.
+        """
+        chunk_keys = [f"{self.chunk_prefix}{doc_id}:{chunk_id}" for chunk_id in chunk_ids]
+        pipe = self.redis_client.pipeline(transaction=False)
+        if chunk_keys:
+            pipe.unlink(*chunk_keys)
+            pipe.srem(f"doc_chunks:{doc_id}", *chunk_keys)
+            pipe.srem("all_chunks", *chunk_keys)
+            pipe.incr(CHUNKS_VERSION_KEY)
+        if delete_document:
+            pipe.unlink(f"document:{doc_id}")
+            self.purge_pending_chunks(doc_id, client=pipe)
+        if not len(pipe):
+            return 0
+        
+        replies = pipe.execute()
+        deleted = replies[0] if chunk_keys else 0
+        logger.info(f"Deleted {deleted} chunks for document {doc_id}")
+        return deleted
 
 
-# Global Redis client instance
-redis_store = RedisVectorStore() 
\ No newline at end of file
+# Global Redis client instance, created on first use so importing this
+# module does no network I/O
+@functools.cache
+def get_redis_store() -> RedisVectorStore:
+    """Return the shared RedisVectorStore, connecting on first use."""
+    return RedisVectorStore()
@@ -8,6 +8,7 @@ import os
 import sys
 import time
 import subprocess
+import importlib.util
 import logging
 from typing import Dict, List, Tuple
 
@@ -135,24 +136,26 @@ class SystemChecker:
         """Check Python dependencies."""
         print("📦 Checking Python dependencies...")
         
-        required_packages = [
-            'fastapi',
-            'uvicorn',
-            'redis',
-            'openai',
-            'unstructured',
-            'google-api-python-client',
-            'numpy',
-            'pydantic'
-        ]
+        # pip package name -> top-level module it installs
+        required_packages = {
+            'fastapi': 'fastapi',
+            'uvicorn': 'uvicorn',
+            'redis': 'redis',
+            'openai': 'openai',
+            'unstructured': 'unstructured',
+            'google-api-python-client': 'googleapiclient',
+            'numpy': 'numpy',
+            'pydantic': 'pydantic'
+        }
         
         missing_packages = []
         
-        for package in required_packages:
-            try:
-                __import__(package.replace('-', '_'))
+        # Locate the modules without importing them, so the check doesn't pay
+        # for (or run) their module-level code
+        for package, module in required_packages.items():
+            if importlib.util.find_spec(module) is not None:
                 print(f"   ✅ {package}")
-            except ImportError:
+            else:
                 print(f"   ❌ {package} not installed")
                 missing_packages.append(package)
         
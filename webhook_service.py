@@ -3,96 +3,374 @@ Google Drive Webhook Service for Automatic Document Re-processing
 Handles real-time notifications when documents change in Google Drive
 """
 
+import asyncio
+import functools
 import hashlib
 import hmac
 import json
 import logging
+import random
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, Optional
-from fastapi import HTTPException
+from typing import Awaitable, Callable, Dict, Any, Mapping, Optional, Set, Tuple, Union
+import httplib2
+from googleapiclient.errors import HttpError
+from openai import OpenAIError
+from redis.exceptions import RedisError
 
 from config import settings
 from document_processor import document_processor
-from redis_client import redis_store
+from embedding_service import embedding_service
+from redis_client import get_redis_store
 from google_drive_service import google_drive_service
 
 logger = logging.getLogger(__name__)
 
+# Request bodies are hashed straight from any of these without copying
+Buffer = Union[bytes, bytearray, memoryview]
+
+# Drive-id -> document lookups are reused for this long during edit bursts
+DRIVE_DOC_CACHE_TTL = 10.0
+DRIVE_DOC_CACHE_SIZE = 4096
+
+# X-Goog-Changed values that can alter a document's indexed content
+CONTENT_CHANGE_FLAGS = {"content", "properties"}
+
+# Event types and resource states that create, restore or remove a file. When
+# a burst is coalesced the newest of these wins; a plain update never hides one
+LIFECYCLE_EVENT_TYPES = {"create", "trash"}
+LIFECYCLE_RESOURCE_STATES = {"add", "untrash", "remove", "trash"}
+
+# Accepted signature headers are "<scheme>=" followed by a 32-byte hex digest:
+# HMAC-SHA256, or keyed BLAKE2b for producers that can sign with it
+SIGNATURE_LENGTHS = {"sha256": 7 + 64, "blake2b": 8 + 64}
+MAX_SIGNATURE_LENGTH = max(SIGNATURE_LENGTHS.values())
+
+# Drive call retries: exponential backoff (0.5s, 1s, 2s, ... capped) plus
+# up to a second of jitter so retries from parallel documents spread out
+DRIVE_RETRY_ATTEMPTS = 5
+DRIVE_RETRY_BASE_DELAY = 0.5
+DRIVE_RETRY_MAX_DELAY = 10.0
+
+# Failures of the services a notification depends on (Redis, Drive, OpenAI,
+# local files, the network); anything else is a bug and is left to propagate
+SERVICE_ERRORS = (RedisError, HttpError, httplib2.HttpLib2Error, OpenAIError, OSError)
+
+
+def _is_transient_drive_error(error: Exception) -> bool:
+    """True for Drive failures worth retrying: rate limits, 5xx and network errors"""
+    if isinstance(error, HttpError):
+        return error.resp.status == 429 or error.resp.status >= 500
+    return isinstance(error, (OSError, httplib2.HttpLib2Error))
+
+
+async def retry_drive_call(func: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+    """Await a Drive service call, retrying transient failures with backoff
+    
+    Permanent errors (404, no permission, ...) are raised right away.
+    """
+    for attempt in range(1, DRIVE_RETRY_ATTEMPTS + 1):
+        try:
+            return await func(*args)
+        except (HttpError, OSError, httplib2.HttpLib2Error) as e:
+            if attempt == DRIVE_RETRY_ATTEMPTS or not _is_transient_drive_error(e):
+                raise
+            failure = str(e)
+        
+        delay = min(DRIVE_RETRY_MAX_DELAY, DRIVE_RETRY_BASE_DELAY * 2 ** (attempt - 1)) + random.uniform(0, 1)
+        logger.warning(
+            "%s failed (%s), retry %d/%d in %.1fs",
+            func.__name__, failure, attempt, DRIVE_RETRY_ATTEMPTS - 1, delay
+        )
+        await asyncio.sleep(delay)
+
+
 class WebhookService:
     def __init__(self):
         self.webhook_secret = settings.webhook_secret
-        self.processed_notifications = set()  # Prevent duplicate processing
+        # Encoded once; HMAC keys are needed as bytes on every request
+        self._secret_bytes = self.webhook_secret.encode() if self.webhook_secret else b""
+        # BLAKE2b keys are limited to 64 bytes; longer secrets are hashed down
+        self._blake2b_key = (
+            self._secret_bytes if len(self._secret_bytes) <= hashlib.blake2b.MAX_KEY_SIZE
+            else hashlib.blake2b(self._secret_bytes).digest()
+        )
+        # Background notification tasks, referenced so they aren't garbage collected
+        self._inflight: Set[asyncio.Task] = set()
+        # Caps concurrent Drive downloads / document re-processing
+        self._processing_sem = asyncio.Semaphore(settings.webhook_max_concurrent)
+        # resource_id -> (expires_at, document mapping), least recently used first
+        self._doc_cache: OrderedDict[str, Tuple[float, Dict[str, Any]]] = OrderedDict()
+        # Per-resource coalescing: latest _dispatch arguments and their flush timer
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._coalesce_timers: Dict[str, asyncio.TimerHandle] = {}
         
-    def verify_webhook_signature(self, payload: bytes, signature: str) -> bool:
-        """Verify that the webhook came from Google Drive"""
+    def verify_webhook_signature(self, payload: Buffer, signature: str) -> bool:
+        """Verify that the webhook came from Google Drive
+        
+        ``payload`` must be the raw request body (``await request.body()``),
+        never re-serialized JSON. A streamed body can be collected in a
+        ``bytearray`` and passed as a ``memoryview``; it is hashed in place.
+        
+        ``signature`` is ``sha256=<hex>`` (HMAC-SHA256 of the body) or, from
+        the X-Signature-BLAKE2B header, ``blake2b=<hex>`` (BLAKE2b of the body
+        keyed with the secret, 32-byte digest). Keyed BLAKE2b needs no HMAC
+        inner/outer passes; producers can move to it while ``sha256=``
+        signatures keep being accepted.
+        """
         if not self.webhook_secret:
             logger.warning("Webhook secret not configured, skipping verification")
             return True
-            
-        expected_signature = hmac.new(
-            self.webhook_secret.encode(),
-            payload,
-            hashlib.sha256
-        ).hexdigest()
         
-        return hmac.compare_digest(f"sha256={expected_signature}", signature)
+        # Reject malformed signatures before doing any MAC work
+        if not signature or len(signature) > MAX_SIGNATURE_LENGTH:
+            return False
+        scheme, _, hex_signature = signature.partition("=")
+        if SIGNATURE_LENGTHS.get(scheme) != len(signature):
+            return False
+        try:
+            received_signature = bytes.fromhex(hex_signature)
+        except ValueError:
+            return False
+        
+        if scheme == "blake2b":
+            expected_signature = hashlib.blake2b(payload, key=self._blake2b_key, digest_size=32).digest()
+        else:
+            # One-shot hmac.digest runs entirely in OpenSSL
+            expected_signature = hmac.digest(self._secret_bytes, payload, "sha256")
+        
+        # Constant-time compare of the raw digests
+        return hmac.compare_digest(expected_signature, received_signature)
     
-    async def handle_drive_notification(self, notification_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle Google Drive change notification"""
+    @staticmethod
+    def _dedup_key(notification_data: Dict[str, Any], headers: Mapping[str, str]) -> str:
+        """Redis key identifying a notification for duplicate suppression"""
+        resource_id = notification_data.get('id')
+        event_time = notification_data.get('eventTime')
+        # Drive numbers the messages of each channel; a redelivery keeps its number
+        message_number = headers.get('X-Goog-Message-Number')
+        if resource_id and (event_time or message_number):
+            # Resource and event type plus the event time or message number
+            # identify a delivery; no need to serialize the whole payload
+            identity = "|".join((
+                str(resource_id),
+                str(notification_data.get('eventType', 'unknown')),
+                str(event_time or ''),
+                headers.get('X-Goog-Channel-ID', ''),
+                message_number or ''
+            )).encode()
+        else:
+            # Nothing per-delivery to go on, so only the whole payload can tell
+            # successive changes to the same file apart; compact separators
+            # keep the encoded payload minimal
+            identity = json.dumps(notification_data, sort_keys=True, separators=(",", ":")).encode()
+        
+        # Not security-sensitive: a short, fast digest is enough
+        return f"whdedup:{hashlib.blake2b(identity, digest_size=8).hexdigest()}"
+    
+    def _is_duplicate(self, notification_data: Dict[str, Any], headers: Mapping[str, str]) -> bool:
+        """Record the notification in Redis; True if it was already seen.
+        
+        A Lua script marks the notification (SET NX EX) and counts duplicates
+        in one atomic round-trip, so duplicates are caught across workers and
+        the markers expire on their own.
+        """
         try:
-            # Extract notification details
-            resource_id = notification_data.get('id')
-            resource_uri = notification_data.get('resourceUri')
-            change_type = notification_data.get('eventType', 'unknown')
-            
-            logger.info(f"Received Drive notification: {change_type} for resource {resource_id}")
-            
-            # Prevent duplicate processing
-            notification_key = f"{resource_id}_{change_type}_{notification_data.get('eventTime', '')}"
-            if notification_key in self.processed_notifications:
-                logger.info(f"Notification already processed: {notification_key}")
-                return {"status": "already_processed"}
-            
-            self.processed_notifications.add(notification_key)
-            
-            # Handle different change types
-            if change_type in ['update', 'create']:
-                return await self._handle_document_change(resource_id, resource_uri)
-            elif change_type == 'trash':
-                return await self._handle_document_deletion(resource_id)
-            else:
-                logger.info(f"Ignoring change type: {change_type}")
-                return {"status": "ignored", "change_type": change_type}
-                
-        except Exception as e:
-            logger.error(f"Error handling Drive notification: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Webhook processing error: {str(e)}")
+            duplicate_count = get_redis_store().mark_notification_seen(
+                self._dedup_key(notification_data, headers), settings.webhook_dedup_ttl
+            )
+        except RedisError as e:
+            # Processing twice is safer than dropping a change
+            logger.warning("Could not check notification dedup: %s", e)
+            return False
+        
+        if duplicate_count:
+            logger.info("webhook.duplicate_count=%d", duplicate_count)
+        return duplicate_count > 0
+    
+    def _get_drive_document(self, resource_id: str) -> Optional[Dict[str, Any]]:
+        """get_document_by_drive_id with a short-lived in-process TTL LRU cache"""
+        now = time.monotonic()
+        cached = self._doc_cache.get(resource_id)
+        if cached:
+            if cached[0] > now:
+                self._doc_cache.move_to_end(resource_id)
+                return cached[1]
+            # Expired entries are dropped when read
+            del self._doc_cache[resource_id]
+        
+        doc = get_redis_store().get_document_by_drive_id(resource_id)
+        if doc:
+            if len(self._doc_cache) >= DRIVE_DOC_CACHE_SIZE:
+                # Evict the least recently used entry
+                self._doc_cache.popitem(last=False)
+            self._doc_cache[resource_id] = (now + DRIVE_DOC_CACHE_TTL, doc)
+        return doc
     
-    async def _handle_document_change(self, resource_id: str, resource_uri: str) -> Dict[str, Any]:
+    async def handle_drive_notification(
+        self,
+        notification_data: Dict[str, Any],
+        headers: Optional[Mapping[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Handle Google Drive change notification
+        
+        ``headers`` are the push-notification request headers; Drive reports
+        the resource state and changed fields there (X-Goog-Resource-State,
+        X-Goog-Changed).
+        """
+        headers = headers or {}
+        
+        # Prevent duplicate processing
+        if self._is_duplicate(notification_data, headers):
+            logger.info("Notification already processed: %s", notification_data.get('id'))
+            return {"status": "already_processed"}
+        
+        # Acknowledge right away; Drive retries slow webhooks
+        dispatch_args = {
+            "notification_data": notification_data,
+            "resource_state": headers.get('X-Goog-Resource-State'),
+            "changed": headers.get('X-Goog-Changed')
+        }
+        
+        resource_id = notification_data.get('id')
+        if not resource_id or settings.webhook_coalesce_window <= 0:
+            self._spawn_dispatch(dispatch_args)
+            return {"status": "queued"}
+        
+        # Drive sends several notifications per save; keep only the latest
+        # per resource and process it once the burst has gone quiet
+        previous = self._latest.get(resource_id)
+        if previous:
+            # Don't let a trailing update hide a creation, trash or restore
+            # earlier in the burst, or a metadata-only change hide a content
+            # change; between lifecycle events the newest wins, so a file
+            # trashed and restored within the window is kept
+            previous_event = previous["notification_data"].get('eventType')
+            if (
+                self._is_lifecycle_event(previous_event, previous["resource_state"])
+                and not self._is_lifecycle_event(notification_data.get('eventType'), dispatch_args["resource_state"])
+            ):
+                dispatch_args["notification_data"] = {**notification_data, 'eventType': previous_event}
+                dispatch_args["resource_state"] = previous["resource_state"]
+            changed_flags = {
+                flag.strip()
+                for value in (previous["changed"], dispatch_args["changed"]) if value
+                for flag in value.split(",") if flag.strip()
+            }
+            dispatch_args["changed"] = ",".join(sorted(changed_flags)) or None
+        self._latest[resource_id] = dispatch_args
+        
+        timer = self._coalesce_timers.pop(resource_id, None)
+        if timer:
+            timer.cancel()
+        self._coalesce_timers[resource_id] = asyncio.get_running_loop().call_later(
+            settings.webhook_coalesce_window, self._flush, resource_id
+        )
+        
+        return {"status": "queued"}
+    
+    @staticmethod
+    def _is_lifecycle_event(event_type: Optional[str], resource_state: Optional[str]) -> bool:
+        """True if a notification creates, restores or removes its file"""
+        return event_type in LIFECYCLE_EVENT_TYPES or resource_state in LIFECYCLE_RESOURCE_STATES
+    
+    def _flush(self, resource_id: str):
+        """Dispatch the latest coalesced notification for a resource"""
+        self._coalesce_timers.pop(resource_id, None)
+        dispatch_args = self._latest.pop(resource_id, None)
+        if dispatch_args:
+            self._spawn_dispatch(dispatch_args)
+    
+    def _spawn_dispatch(self, dispatch_args: Dict[str, Any]):
+        """Run _dispatch as a tracked background task"""
+        task = asyncio.create_task(self._dispatch(**dispatch_args))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+        task.add_done_callback(
+            functools.partial(self._log_dispatch_error, dispatch_args["notification_data"].get('id'))
+        )
+    
+    @staticmethod
+    def _log_dispatch_error(resource_id: Optional[str], task: asyncio.Task):
+        """Log an unexpected error that escaped a background _dispatch task"""
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            logger.exception("Unexpected error processing Drive notification for %s", resource_id, exc_info=exc)
+    
+    async def _dispatch(
+        self,
+        notification_data: Dict[str, Any],
+        resource_state: Optional[str] = None,
+        changed: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Process a queued Drive notification in the background"""
+        # Extract notification details
+        resource_id = notification_data.get('id')
+        resource_uri = notification_data.get('resourceUri')
+        change_type = notification_data.get('eventType', 'unknown')
+        
+        logger.info("Received Drive notification: %s for resource %s", change_type, resource_id)
+        
+        # Handle different change types
+        if change_type in ['update', 'create']:
+            async with self._processing_sem:
+                return await self._handle_document_change(
+                    resource_id, resource_uri, resource_state, changed
+                )
+        elif change_type == 'trash':
+            return await self._handle_document_deletion(resource_id)
+        else:
+            logger.info("Ignoring change type: %s", change_type)
+            return {"status": "ignored", "change_type": change_type}
+    
+    async def _handle_document_change(
+        self,
+        resource_id: str,
+        resource_uri: str,
+        resource_state: Optional[str] = None,
+        changed: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Handle document update/creation"""
         try:
+            # Drive's headers already say what changed; skip channel sync
+            # messages and updates that can't affect the indexed content
+            changed_flags = {flag.strip() for flag in (changed or "").split(",") if flag.strip()}
+            if resource_state == 'sync' or (
+                resource_state == 'update' and not changed_flags & CONTENT_CHANGE_FLAGS
+            ):
+                logger.info(
+                    "Document %s has no content change (%s: %s), skipping",
+                    resource_id, resource_state, changed
+                )
+                return {"status": "no_change"}
+            
             # Check if we're already tracking this document
-            existing_doc = redis_store.get_document_by_drive_id(resource_id)
+            existing_doc = self._get_drive_document(resource_id)
             
             if existing_doc:
-                logger.info(f"Document {resource_id} already exists, checking for changes...")
-                
-                # Download current version and check if content changed
-                file_info = await google_drive_service.get_file_info(resource_id)
-                if not file_info:
-                    logger.error(f"Could not get file info for {resource_id}")
-                    return {"status": "error", "message": "File not accessible"}
+                logger.info("Document %s already exists, checking for changes...", resource_id)
                 
-                # Check modification time or version
-                current_modified = file_info.get('modifiedTime')
-                stored_modified = existing_doc.get('modified_time')
-                
-                if current_modified == stored_modified:
-                    logger.info(f"Document {resource_id} not modified, skipping")
-                    return {"status": "no_change"}
+                # A content change is reported by Drive itself; otherwise fetch
+                # the file info and compare modification times
+                if 'content' not in changed_flags:
+                    file_info = await retry_drive_call(google_drive_service.get_file_info, resource_id)
+                    if not file_info:
+                        logger.error("Could not get file info for %s", resource_id)
+                        return {"status": "error", "message": "File not accessible"}
+                    
+                    # Check modification time or version
+                    current_modified = file_info.get('modifiedTime')
+                    stored_modified = existing_doc.get('modified_time')
+                    
+                    if current_modified == stored_modified:
+                        logger.info("Document %s not modified, skipping", resource_id)
+                        return {"status": "no_change"}
                 
                 # Document changed - remove old version and re-process
-                logger.info(f"Document {resource_id} modified, re-processing...")
+                logger.info("Document %s modified, re-processing...", resource_id)
                 await self._remove_document_chunks(existing_doc['doc_id'])
             
             # Process the updated/new document
@@ -105,72 +383,120 @@ class WebhookService:
                 "chunks_created": result.get('chunks_created', 0)
             }
             
-        except Exception as e:
-            logger.error(f"Error processing document change: {str(e)}")
+        except SERVICE_ERRORS as e:
+            logger.exception("Error processing document change for %s", resource_id)
             return {"status": "error", "message": str(e)}
     
     async def _handle_document_deletion(self, resource_id: str) -> Dict[str, Any]:
         """Handle document deletion"""
         try:
-            existing_doc = redis_store.get_document_by_drive_id(resource_id)
+            existing_doc = self._get_drive_document(resource_id)
             if existing_doc:
+                self._doc_cache.pop(resource_id, None)
                 await self._remove_document_chunks(existing_doc['doc_id'])
-                logger.info(f"Removed document chunks for deleted file {resource_id}")
+                logger.info("Removed document chunks for deleted file %s", resource_id)
                 return {"status": "deleted", "document_id": existing_doc['doc_id']}
             else:
-                logger.info(f"Document {resource_id} not found in our system")
+                logger.info("Document %s not found in our system", resource_id)
                 return {"status": "not_found"}
                 
-        except Exception as e:
-            logger.error(f"Error handling document deletion: {str(e)}")
+        except SERVICE_ERRORS as e:
+            logger.exception("Error handling deletion of %s", resource_id)
             return {"status": "error", "message": str(e)}
     
     async def _process_drive_document(self, resource_id: str, resource_uri: str) -> Dict[str, Any]:
         """Process a Google Drive document"""
+        # Download the document
+        file_path = await retry_drive_call(google_drive_service.download_file, resource_id)
+        if not file_path:
+            raise OSError(f"Failed to download Drive file {resource_id}")
+        
+        # Fetch the Drive metadata while the file is parsed and chunked; both
+        # run in worker threads, the Drive call over its own HTTP transport
+        metadata_task = asyncio.create_task(
+            retry_drive_call(google_drive_service.get_file_info, resource_id)
+        )
         try:
-            # Download and process the document
-            file_path = await google_drive_service.download_file(resource_id)
-            if not file_path:
-                raise Exception("Failed to download file")
+            doc_id, chunks, _ = await asyncio.to_thread(
+                document_processor.process_file, file_path, resource_uri or ""
+            )
             
-            # Process document and create embeddings
-            doc_id = await document_processor.process_file(file_path)
-            
-            # Store metadata linking Drive ID to our document ID
-            metadata = await google_drive_service.get_file_info(resource_id)
-            redis_store.store_drive_document_mapping(resource_id, doc_id, metadata)
-            
-            # Get chunk count
-            chunks = redis_store.get_document_chunks(doc_id)
-            
-            return {
-                "document_id": doc_id,
-                "chunks_created": len(chunks),
-                "drive_id": resource_id
-            }
-            
-        except Exception as e:
-            logger.error(f"Error processing Drive document {resource_id}: {str(e)}")
+            # Create embeddings while the metadata fetch finishes
+            embeddings = await asyncio.to_thread(
+                embedding_service.generate_embeddings_batch, [chunk["text"] for chunk in chunks]
+            )
+        except Exception:
+            metadata_task.cancel()
             raise
+        
+        metadata = await metadata_task
+        if not metadata:
+            raise OSError(f"Could not get file info for Drive file {resource_id}")
+        
+        # Link the Drive ID to the document before storing any chunks, so a
+        # failed mapping write can't leave chunks that no later notification
+        # would clean up
+        get_redis_store().store_drive_document_mapping(resource_id, doc_id, metadata)
+        self._doc_cache.pop(resource_id, None)
+        
+        stored = get_redis_store().enqueue_chunks([
+            {**chunk, "embedding": embedding}
+            for chunk, embedding in zip(chunks, embeddings)
+        ])
+        chunks_created = sum(stored)
+        if chunks and not chunks_created:
+            # Drop the mapping too; otherwise the next notification would see
+            # an unchanged modifiedTime and never re-process the file
+            get_redis_store().delete_drive_document_mapping(resource_id)
+            raise RedisError(f"None of the {len(chunks)} chunks of Drive file {resource_id} were stored")
+        if chunks_created < len(chunks):
+            logger.warning(
+                "Stored %d of %d chunks for Drive file %s",
+                chunks_created, len(chunks), resource_id
+            )
+        
+        return {
+            "document_id": doc_id,
+            "chunks_created": chunks_created,
+            "drive_id": resource_id
+        }
     
     async def _remove_document_chunks(self, doc_id: str):
         """Remove all chunks for a document"""
+        # Stream chunk ids and UNLINK them a batch at a time
+        count = 0
+        for chunk_ids in get_redis_store().iter_chunk_ids(doc_id, 512):
+            get_redis_store().delete_chunks_bulk(doc_id, chunk_ids)
+            count += len(chunk_ids)
+        
+        # Remove document metadata and any chunks still queued for indexing
+        get_redis_store().delete_chunks_bulk(doc_id, [], delete_document=True)
+        
+        logger.info("Removed %d chunks for document %s", count, doc_id)
+    
+    def _store_watch_state(self, result: Dict[str, Any], scope: str, folder_id: Optional[str] = None):
+        """Persist what's needed to renew or stop a new watch channel"""
         try:
-            chunks = redis_store.get_document_chunks(doc_id)
-            for chunk in chunks:
-                redis_store.delete_chunk(chunk['chunk_id'])
-            
-            # Remove document metadata
-            redis_store.delete_document(doc_id)
-            
-            logger.info(f"Removed {len(chunks)} chunks for document {doc_id}")
-            
-        except Exception as e:
-            logger.error(f"Error removing document chunks: {str(e)}")
-            raise
+            get_redis_store().store_watch_state_pipeline(result.get('watch_id'), {
+                "watch_id": result.get('watch_id'),
+                "resource_id": result.get('resource_id'),
+                "expiration": result.get('expiration'),
+                "start_page_token": result.get('start_page_token'),
+                "folder_id": folder_id,
+                "scope": scope,
+                "created_at": datetime.now().isoformat()
+            })
+        except RedisError as e:
+            # The channel is live either way; renewal just has less to go on
+            logger.error("Error storing Drive watch state: %s", e)
     
-    def setup_drive_webhook(self, folder_id: Optional[str] = None) -> Dict[str, Any]:
-        """Setup Google Drive webhook for a folder or entire drive"""
+    async def setup_drive_webhook(self, folder_id: Optional[str] = None) -> Dict[str, Any]:
+        """Setup Google Drive webhook for a folder or entire drive
+        
+        The watch requests are blocking Drive API calls, so they run in a
+        worker thread instead of on the event loop, over their own HTTP
+        transport since the shared Drive client isn't thread-safe.
+        """
         try:
             if not google_drive_service.is_authenticated():
                 return {
@@ -182,14 +508,17 @@ class WebhookService:
             
             if folder_id:
                 # Set up webhook for specific folder
-                result = google_drive_service.watch_folder_changes(
+                result = await asyncio.to_thread(
+                    google_drive_service.watch_folder_changes,
                     folder_id=folder_id,
                     webhook_url=webhook_url,
-                    webhook_secret=self.webhook_secret
+                    webhook_secret=self.webhook_secret,
+                    http=google_drive_service.new_http()
                 )
                 
                 if result.get("status") == "success":
-                    logger.info(f"Successfully set up webhook for folder {folder_id}")
+                    logger.info("Successfully set up webhook for folder %s", folder_id)
+                    self._store_watch_state(result, scope="folder_specific", folder_id=folder_id)
                     return {
                         "status": "success",
                         "webhook_url": webhook_url,
@@ -204,13 +533,16 @@ class WebhookService:
                     return result
             else:
                 # Set up webhook for all changes
-                result = google_drive_service.watch_all_changes(
+                result = await asyncio.to_thread(
+                    google_drive_service.watch_all_changes,
                     webhook_url=webhook_url,
-                    webhook_secret=self.webhook_secret
+                    webhook_secret=self.webhook_secret,
+                    http=google_drive_service.new_http()
                 )
                 
                 if result.get("status") == "success":
                     logger.info("Successfully set up webhook for all Drive changes")
+                    self._store_watch_state(result, scope="all_changes")
                     return {
                         "status": "success",
                         "webhook_url": webhook_url,
@@ -224,8 +556,8 @@ class WebhookService:
                 else:
                     return result
             
-        except Exception as e:
-            logger.error(f"Error setting up Drive webhook: {str(e)}")
+        except SERVICE_ERRORS as e:
+            logger.exception("Error setting up Drive webhook")
             return {"status": "error", "message": str(e)}
 
 # Global webhook service instance